@@ -1,15 +1,18 @@
 import os
 
-from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
-from shop import routing
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecommerce_backend.settings")
 
+django_asgi_app = get_asgi_application()
+
+from shop import routing  # noqa: E402  (needs the app registry)
+from shop.middleware import JWTAuthMiddleware  # noqa: E402
+
 application = ProtocolTypeRouter(
     {
-        "http": get_asgi_application(),
-        "websocket": AuthMiddlewareStack(URLRouter(routing.websocket_urlpatterns)),
+        "http": django_asgi_app,
+        "websocket": JWTAuthMiddleware(URLRouter(routing.websocket_urlpatterns)),
     }
 )
@@ -84,15 +84,92 @@ TEMPLATES = [
 # WSGI_APPLICATION = 'ecommerce_backend.wsgi.application'
 ASGI_APPLICATION = "ecommerce_backend.asgi.application"
 
-# Redis Channel Layer
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {
-            "hosts": [("127.0.0.1", 6379)],
+# Channel layer: Redis, or "memory" for a single process (development,
+# tests, a one-node deployment), where queued notifications are also pushed
+# by the web process itself instead of a separate dispatcher.
+#
+# With Redis, run `manage.py dispatch_notifications` as its own service next
+# to the web servers; it stores and pushes the notification outbox. Until a
+# dispatcher's heartbeat is seen the web processes drain the outbox after
+# each commit instead, which works but puts that work back on requests.
+# `manage.py run_periodic_jobs` (retention, rollups) is a service too.
+CHANNEL_LAYER = config("CHANNEL_LAYER", default="redis")
+if CHANNEL_LAYER == "memory":
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [("127.0.0.1", 6379)],
+            },
         },
-    },
-}
+    }
+# Websocket pushes are handed to shop.publisher, which sends them in
+# batches from a background thread. Beyond this many waiting messages new
+# ones are dropped (and counted) rather than slowing the sender down.
+NOTIFICATION_PUBLISHER_QUEUE_SIZE = config(
+    "NOTIFICATION_PUBLISHER_QUEUE_SIZE", default=10000, cast=int
+)
+NOTIFICATION_PUBLISHER_BATCH_SIZE = config("NOTIFICATION_PUBLISHER_BATCH_SIZE", default=200, cast=int)
+# Cache
+# Set REDIS_URL in production so every worker shares the same entries and
+# version counters. Without it the cache is per process, and response
+# caching, ETags and cached unread counts are switched off unless DEBUG is
+# on (see shop.checks).
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "waqth",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": config("CACHE_MAX_ENTRIES", default=5000, cast=int)},
+        },
+    }
+CATALOG_CACHE_ALIAS = "default"
+CATALOG_CACHE_TIMEOUT = config("CATALOG_CACHE_TIMEOUT", default=60 * 60, cast=int)
+# Sales do not invalidate the catalog right away (see shop.inventory): the
+# first read this many seconds after a stock change does.
+STALE_VERSION_MAX_AGE = config("STALE_VERSION_MAX_AGE", default=30, cast=int)
+
+# Upper bounds of the price buckets reported by /api/products/facets/; the
+# last bucket is open-ended.
+PRODUCT_PRICE_BUCKETS = [500, 1000, 2500, 5000, 10000]
+
+# Idempotency-Key handling (shop.idempotency): how long a stored response is
+# replayed, and after how long an unfinished claim may be taken over.
+IDEMPOTENCY_KEY_TTL = config("IDEMPOTENCY_KEY_TTL", default=24 * 60 * 60, cast=int)
+IDEMPOTENCY_LOCK_TIMEOUT = config("IDEMPOTENCY_LOCK_TIMEOUT", default=60, cast=int)
+
+# Repeated cart updates of the same product within this many seconds are
+# sent as one notification with the final quantity.
+CART_NOTIFICATION_WINDOW = config("CART_NOTIFICATION_WINDOW", default=5, cast=float)
+
+# Skip websocket pushes to users with no open socket. Needs a cache shared
+# by the ASGI servers and the dispatcher (Redis), where the open socket
+# counts are kept; with the per-process local cache every push is sent.
+NOTIFICATION_SKIP_OFFLINE = config("NOTIFICATION_SKIP_OFFLINE", default=bool(REDIS_URL), cast=bool)
+
+# At most this many missed notifications are replayed to a reconnecting
+# websocket (see NotificationConsumer.replay_missed).
+NOTIFICATION_REPLAY_LIMIT = config("NOTIFICATION_REPLAY_LIMIT", default=100, cast=int)
+
+# Notification retention job (shop.tasks.delete_old_notifications): rows
+# older than this many days are deleted in id-range batches of the given
+# size, sleeping between batches to spread the write load.
+NOTIFICATION_RETENTION_DAYS = config("NOTIFICATION_RETENTION_DAYS", default=7, cast=int)
+NOTIFICATION_RETENTION_BATCH_SIZE = config(
+    "NOTIFICATION_RETENTION_BATCH_SIZE", default=5000, cast=int
+)
+NOTIFICATION_RETENTION_PAUSE = config("NOTIFICATION_RETENTION_PAUSE", default=0.1, cast=float)
+
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
 }
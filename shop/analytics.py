@@ -0,0 +1,239 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesRollup, Order, Product, SalesRollupDelta
+
+# Revenue is quantity * the product's current price, as it always has been
+# for our reports; the nightly reconcile recomputes it the same way.
+#
+# Order writes never touch DailySalesRollup: every order of a day and
+# product would otherwise update the same row and queue behind each other's
+# transactions. They append SalesRollupDelta rows instead, which
+# fold_rollup_deltas adds into the rollup every minute. Reports add the
+# deltas not folded in yet, so they are never behind.
+
+
+def _apply(deltas):
+    """
+    Add ``{(day, product_id, status): [orders, units]}`` to the rollup in
+    one ``INSERT ... ON CONFLICT`` statement, pricing units by a join on
+    the product table. Only the fold job calls this.
+    """
+    deltas = {key: value for key, value in deltas.items() if any(value)}
+    if not deltas:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(DailySalesRollup._meta.db_table)
+    product_table = qn(Product._meta.db_table)
+    values = ", ".join(["(%s::date, %s::bigint, %s, %s::integer, %s::integer)"] * len(deltas))
+    params = []
+    # Fixed key order so concurrent writers lock rollup rows in the same order.
+    for (day, product_id, status), (orders, units) in sorted(deltas.items()):
+        params += [day, product_id, status, orders, units]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (day, product_id, status, orders, units, revenue)"
+            f" SELECT v.day, v.product_id, v.status, v.orders, v.units, v.units * p.price"
+            f" FROM (VALUES {values}) AS v (day, product_id, status, orders, units)"
+            f" JOIN {product_table} p ON p.id = v.product_id"
+            f" ORDER BY v.day, v.product_id, v.status"
+            f" ON CONFLICT (day, product_id, status) DO UPDATE SET"
+            f" orders = {table}.orders + EXCLUDED.orders,"
+            f" units = {table}.units + EXCLUDED.units,"
+            f" revenue = {table}.revenue + EXCLUDED.revenue",
+            params,
+        )
+
+
+def _record(deltas):
+    """Append ``{(day, product_id, status): [orders, units]}`` as delta rows."""
+    SalesRollupDelta.objects.bulk_create(
+        SalesRollupDelta(day=day, product_id=product_id, status=status, orders=orders, units=units)
+        for (day, product_id, status), (orders, units) in deltas.items()
+        if orders or units
+    )
+
+
+def fold_rollup_deltas(batch_size=5000):
+    """
+    Move pending SalesRollupDelta rows into DailySalesRollup, ``batch_size``
+    at a time, each batch deleted and applied in one transaction. Returns
+    the number of deltas folded.
+    """
+    table = connection.ops.quote_name(SalesRollupDelta._meta.db_table)
+    total = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id IN"
+                f" (SELECT id FROM {table} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)"
+                f" RETURNING day, product_id, status, orders, units",
+                [batch_size],
+            )
+            rows = cursor.fetchall()
+            deltas = defaultdict(lambda: [0, 0])
+            for day, product_id, status, orders, units in rows:
+                delta = deltas[(day, product_id, status)]
+                delta[0] += orders
+                delta[1] += units
+            _apply(deltas)
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+
+
+def _key(order, status=None):
+    return (timezone.localdate(order.date), order.product_id, status or order.status)
+
+
+def record_orders_created(orders):
+    """Count newly placed orders. Call in the transaction that creates them."""
+    deltas = defaultdict(lambda: [0, 0])
+    for order in orders:
+        delta = deltas[_key(order)]
+        delta[0] += 1
+        delta[1] += order.quantity
+    _record(deltas)
+
+
+def record_order_changed(old, new):
+    """Move an updated order between rollup rows (status, product or quantity)."""
+    deltas = defaultdict(lambda: [0, 0])
+    deltas[_key(old)][0] -= 1
+    deltas[_key(old)][1] -= old.quantity
+    deltas[_key(new)][0] += 1
+    deltas[_key(new)][1] += new.quantity
+    _record(deltas)
+
+
+@transaction.atomic
+def reconcile_rollups(first_day, last_day):
+    """
+    Rebuild the rollup rows for ``first_day``..``last_day`` (inclusive) from
+    the orders themselves. Returns the number of rows written.
+    """
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+
+    # Waits for order transactions still writing deltas and holds off new
+    # ones, so every order is counted either in the rebuilt rows or in a
+    # delta that survives, never both.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"LOCK TABLE {connection.ops.quote_name(SalesRollupDelta._meta.db_table)} IN SHARE MODE"
+        )
+    SalesRollupDelta.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+    DailySalesRollup.objects.filter(day__gte=first_day, day__lte=last_day).delete()
+    rows = (
+        Order.objects.filter(date__gte=start, date__lt=end)
+        .annotate(day=TruncDate("date"))
+        .values("day", "product_id", "status")
+        .annotate(
+            total_orders=Count("id"),
+            total_units=Sum("quantity"),
+            total_revenue=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by()
+    )
+    return len(
+        DailySalesRollup.objects.bulk_create(
+            (
+                DailySalesRollup(
+                    day=row["day"],
+                    product_id=row["product_id"],
+                    status=row["status"],
+                    orders=row["total_orders"],
+                    units=row["total_units"],
+                    revenue=row["total_revenue"],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+    )
+
+
+def record_order_deleted(order):
+    deltas = {_key(order): [-1, -order.quantity]}
+    _record(deltas)
+
+
+GROUPINGS = {
+    "day": ("day",),
+    "product": ("product_id", "product__name"),
+    "category": ("product__category__name",),
+    "status": ("status",),
+}
+
+
+def _filter_report_rows(rows, first_day, last_day, statuses, product_id, category):
+    rows = rows.filter(day__gte=first_day, day__lte=last_day)
+    if statuses:
+        rows = rows.filter(status__in=statuses)
+    if product_id:
+        rows = rows.filter(product_id=product_id)
+    if category:
+        rows = rows.filter(product__category__name=category)
+    return rows
+
+
+def sales_report(first_day, last_day, group_by="day", statuses=None, product_id=None, category=None):
+    """
+    Orders, units and revenue for ``first_day``..``last_day`` (inclusive)
+    grouped by one of ``GROUPINGS``, read from the rollup table plus the
+    deltas not folded into it yet.
+    """
+    columns = GROUPINGS[group_by]
+    filters = (first_day, last_day, statuses, product_id, category)
+    folded = (
+        _filter_report_rows(DailySalesRollup.objects.all(), *filters)
+        .values(*columns)
+        .annotate(
+            total_orders=Sum("orders"),
+            total_units=Sum("units"),
+            total_revenue=Sum("revenue"),
+        )
+        .order_by()
+    )
+    pending = (
+        _filter_report_rows(SalesRollupDelta.objects.all(), *filters)
+        .values(*columns)
+        .annotate(
+            total_orders=Sum("orders"),
+            total_units=Sum("units"),
+            total_revenue=Sum(F("units") * F("product__price")),
+        )
+        .order_by()
+    )
+
+    totals = {}
+    for row in [*folded, *pending]:
+        group = tuple(row[column] for column in columns)
+        if group in totals:
+            total = totals[group]
+            total["total_orders"] += row["total_orders"]
+            total["total_units"] += row["total_units"]
+            total["total_revenue"] += row["total_revenue"]
+        else:
+            totals[group] = row
+
+    names = {"product_id": "product", "product__name": "product_name", "product__category__name": "category"}
+    # Ordered like the database would, with empty groups (no category) last.
+    return [
+        {
+            **{names.get(column, column): row[column] for column in columns},
+            "orders": row["total_orders"],
+            "units": row["total_units"],
+            "revenue": row["total_revenue"],
+        }
+        for _, row in sorted(
+            totals.items(), key=lambda item: [(value is None, value) for value in item[0]]
+        )
+    ]
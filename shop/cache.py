@@ -0,0 +1,215 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+# Backends whose entries are not shared by every worker on every node. A
+# version counter kept in one of them is only bumped in the process that
+# handled the write, so other workers would keep serving (and 304-ing) the
+# old version indefinitely.
+UNSHARED_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.filebased.FileBasedCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def versioned_cache_enabled():
+    """
+    Whether responses may be cached and answered with 304 from version
+    counters: only with a cache shared by all workers, or under DEBUG,
+    where a single development process is assumed. See shop.checks.
+    """
+    backend = settings.CACHES[settings.CATALOG_CACHE_ALIAS]["BACKEND"]
+    return settings.DEBUG or backend not in UNSHARED_BACKENDS
+
+
+def _version_key(scope):
+    return f"version:{scope}"
+
+
+def _seed_version():
+    # Seed from the clock so a version lost to eviction never comes back as
+    # a value that older entries were stored under.
+    return time.time_ns() // 1000
+
+
+def get_version(scope):
+    """
+    Current version of ``scope``, bumped first if the scope was marked
+    stale at least STALE_VERSION_MAX_AGE seconds ago.
+    """
+    cache = get_cache()
+    key, stale_key = _version_key(scope), _stale_key(scope)
+    values = cache.get_many([key, stale_key])
+    version = values.get(key)
+    if version is None:
+        cache.add(key, _seed_version(), timeout=None)
+        version = cache.get(key)
+    marked_at = values.get(stale_key)
+    if marked_at is not None and time.time() - marked_at >= settings.STALE_VERSION_MAX_AGE:
+        # Whoever deletes the mark bumps, so concurrent readers bump once.
+        if cache.delete(stale_key):
+            version = bump_version(scope)
+    return version
+
+
+def bump_version(scope):
+    cache = get_cache()
+    key = _version_key(scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _seed_version(), timeout=None)
+        return cache.get(key)
+
+
+def _stale_key(scope):
+    return f"stale:{scope}"
+
+
+def mark_stale(scope):
+    """
+    Note that ``scope`` changed without bumping it: readers keep the current
+    version for up to STALE_VERSION_MAX_AGE seconds, then get_version()
+    bumps it. Later marks do not push that back.
+    """
+    get_cache().add(_stale_key(scope), time.time(), timeout=None)
+
+
+def bump_if_stale(scope):
+    """Bump ``scope`` now if it is marked stale. Returns whether it was."""
+    if get_cache().delete(_stale_key(scope)):
+        bump_version(scope)
+        return True
+    return False
+
+
+def request_fingerprint(request):
+    # With the host and scheme: paginated bodies hold absolute next and
+    # previous links, which differ between e.g. the public and internal URL.
+    query = "&".join(sorted(request.query_params.urlencode().split("&")))
+    url = f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+    return hashlib.md5(url.encode()).hexdigest()
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "backend": get_cache().__class__.__name__,
+        "enabled": versioned_cache_enabled(),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
+
+
+class CachedResponseMixin:
+    """
+    Read-through cache for ``list`` and ``retrieve``.
+
+    Entries are keyed on ``cache_scope``'s current version, so bumping the
+    version (see ``shop.signals``) invalidates every cached response of the
+    scope at once without having to find and delete keys.
+    """
+
+    cache_scope = None
+
+    def cache_key(self, request):
+        version = get_version(self.cache_scope)
+        return f"response:{self.cache_scope}:{version}:{request_fingerprint(request)}"
+
+    def cached_response(self, request, build):
+        if not versioned_cache_enabled():
+            return build()
+        cache = get_cache()
+        key = self.cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _record("hits")
+            return Response(data)
+
+        _record("misses")
+        response = build()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs),
+        )
+
+
+class ETagMixin:
+    """
+    ETags for ``list`` and ``retrieve`` built from a version counter instead
+    of the response body, so a matching ``If-None-Match`` is answered with
+    304 before the queryset or serializer ever runs.
+
+    Views return the version scope their response depends on from
+    ``get_etag_scope`` (or ``None`` to skip conditional handling). Views
+    whose scope may be marked stale (see ``mark_stale``) set ``weak_etag``,
+    since the body can change briefly under the same version.
+    """
+
+    weak_etag = False
+
+    def get_etag_scope(self, request):
+        return None
+
+    def conditional_response(self, request, build):
+        scope = self.get_etag_scope(request)
+        if scope is None or not versioned_cache_enabled():
+            return build()
+
+        etag = quote_etag(
+            f"{scope}.{get_version(scope)}.{request_fingerprint(request)[:16]}"
+        )
+        if self.weak_etag:
+            etag = f"W/{etag}"
+        # If-None-Match uses the weak comparison.
+        sent = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in sent}:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        response = build()
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, lambda: super(ETagMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, lambda: super(ETagMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .cache import versioned_cache_enabled
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    if versioned_cache_enabled():
+        return []
+    return [
+        Warning(
+            f"The '{settings.CATALOG_CACHE_ALIAS}' cache is not shared between worker "
+            "processes, so cached responses, ETags and cached unread counts are disabled.",
+            hint="Set REDIS_URL to a Redis server every worker can reach.",
+            id="shop.W001",
+        )
+    ]
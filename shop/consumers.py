@@ -1,33 +1,122 @@
+import asyncio
 import json
+from urllib.parse import parse_qs
 
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Notification
+from .notifications import (ADMINS_GROUP, CONNECTIONS_REFRESH, connection_alive,
+                            connection_closed, connection_opened, user_group)
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
-    print("CONNECT METHOD STARTED")
+    """
+    Live notifications of the user authenticated by JWTAuthMiddleware, on
+    ``ws/notifications/?token=<access token>``. The legacy
+    ``ws/notifications/<username>/`` route still works when the username
+    matches the token.
+    """
 
     async def connect(self):
-        print("Attempting to connect...")
-        try:
-            self.username = self.scope["url_route"]["kwargs"]["username"]
-            print(f"Username extracted: {self.username}")
-
-            self.group_name = f"notifications_{self.username}"
-
-            await self.channel_layer.group_add(self.group_name, self.channel_name)
-            self.send(text_data=json.dumps({"username": self.username}))
-            await self.accept()
-            print("Connection accepted.")
-        except KeyError:
-            print("Error: 'username' not found in URL kwargs.")
+        user = self.scope.get("user")
+        if not (user and user.is_authenticated):
             await self.close()
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
+            return
+        username = self.scope["url_route"]["kwargs"].get("username")
+        if username is not None and username != user.username:
             await self.close()
+            return
+
+        self.user_id = int(user.pk)
+        self.group_name = user_group(self.user_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        # Staff sockets also get the notifications sent to all admins.
+        self.is_admin = user.is_staff
+        if self.is_admin:
+            await self.channel_layer.group_add(ADMINS_GROUP, self.channel_name)
+        await sync_to_async(connection_opened)(self.user_id)
+        self.presence = asyncio.create_task(self.keep_presence())
+        self.replayed_up_to = 0
+        await self.accept()
+
+        # Joined the groups first, so nothing sent from here on is lost;
+        # live frames already covered by the replay are skipped below.
+        await self.replay_missed()
+
+    async def keep_presence(self):
+        while True:
+            await asyncio.sleep(CONNECTIONS_REFRESH)
+            await sync_to_async(connection_alive)(self.user_id)
+
+    def get_missed(self, last_id, since, limit):
+        missed = Notification.objects.filter(user_id=self.user_id)
+        if last_id is not None:
+            missed = missed.filter(id__gt=last_id)
+        else:
+            missed = missed.filter(created_at__gt=since)
+        return list(
+            missed.order_by("id").values("id", "message", "created_at", "is_read")[: limit + 1]
+        )
+
+    async def replay_missed(self):
+        """
+        On reconnect the client sends ``?last_id=<id>`` (or ``?since=<ISO
+        timestamp>``) and gets what it missed, oldest first, followed by a
+        ``replay_done`` frame. ``truncated`` in that frame means there was
+        more than NOTIFICATION_REPLAY_LIMIT and the client should reload
+        the list instead.
+        """
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        last_id = params.get("last_id", [""])[0]
+        try:
+            since = parse_datetime(params.get("since", [""])[0])
+        except ValueError:
+            since = None
+        if not (last_id.isdigit() or since):
+            return
+        if since and timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+        limit = settings.NOTIFICATION_REPLAY_LIMIT
+        missed = await database_sync_to_async(self.get_missed)(
+            int(last_id) if last_id.isdigit() else None, since, limit
+        )
+        for notification in missed[:limit]:
+            await self.send(
+                text_data=json.dumps(
+                    {
+                        "id": notification["id"],
+                        "message": notification["message"],
+                        "created_at": notification["created_at"].isoformat(),
+                        "is_read": notification["is_read"],
+                        "replay": True,
+                    }
+                )
+            )
+            self.replayed_up_to = notification["id"]
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "replay_done",
+                    "last_id": self.replayed_up_to or None,
+                    "truncated": len(missed) > limit,
+                }
+            )
+        )
 
     async def disconnect(self, close_code):
+        if hasattr(self, "presence"):
+            self.presence.cancel()
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            await sync_to_async(connection_closed)(self.user_id)
+        if getattr(self, "is_admin", False):
+            await self.channel_layer.group_discard(ADMINS_GROUP, self.channel_name)
 
     async def receive(self, text_data):
         data = json.loads(text_data)
@@ -42,9 +131,20 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         )
         print(message)
 
+    async def unread_count(self, event):
+        await self.send(
+            text_data=json.dumps({"type": "unread_count", "unread": event["content"]["unread"]})
+        )
+
     async def send_notification(self, event):
         try:
-            message = event["content"]["message"]
-            await self.send(text_data=json.dumps({"message": message}))
+            content = event["content"]
+            frame = {"message": content["message"]}
+            notification_id = content.get("ids", {}).get(str(self.user_id))
+            if notification_id is not None:
+                if notification_id <= self.replayed_up_to:
+                    return
+                frame.update(id=notification_id, created_at=content["created_at"])
+            await self.send(text_data=json.dumps(frame))
         except KeyError as e:
             print(f"KeyError in send_notification: {e}. Event: {event}")
@@ -0,0 +1,43 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django_filters import rest_framework as filters
+
+from .models import Order, Product
+
+
+class ProductFilter(filters.FilterSet):
+    min_price = filters.NumberFilter(field_name="price", lookup_expr="gte")
+    max_price = filters.NumberFilter(field_name="price", lookup_expr="lte")
+    in_stock = filters.BooleanFilter(method="filter_in_stock")
+
+    class Meta:
+        model = Product
+        fields = ["category__name", "active"]
+
+    def filter_in_stock(self, queryset, name, value):
+        if value:
+            return queryset.filter(stock__gt=0)
+        return queryset.filter(Q(stock=0) | Q(stock__isnull=True))
+
+
+class OrderFilter(filters.FilterSet):
+    # Compared against the raw timestamp (not date__gte) so the date
+    # indexes stay usable.
+    date_from = filters.DateFilter(method="filter_date_from")
+    date_to = filters.DateFilter(method="filter_date_to")
+
+    class Meta:
+        model = Order
+        fields = ["user", "product", "status"]
+
+    @staticmethod
+    def _start_of(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def filter_date_from(self, queryset, name, value):
+        return queryset.filter(date__gte=self._start_of(value))
+
+    def filter_date_to(self, queryset, name, value):
+        return queryset.filter(date__lt=self._start_of(value + timedelta(days=1)))
@@ -0,0 +1,149 @@
+import functools
+import hashlib
+import json
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+# A client that sends ``Idempotency-Key: <unique value>`` gets the response
+# of the first request with that key replayed for every retry, instead of
+# the work (stock, Razorpay orders) being done again.
+
+HEADER = "Idempotency-Key"
+
+
+def _request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _claim(key, scope, request_hash):
+    """
+    Insert the in-progress row for ``key``, or take over one that expired
+    or whose request never finished. Returns True if this request owns it.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    table = connection.ops.quote_name(IdempotencyRecord._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (key, scope, request_hash, created_at, expires_at)"
+            f" VALUES (%s, %s, %s, %s, %s) ON CONFLICT (key, scope) DO NOTHING",
+            [key, scope, request_hash, now, expires_at],
+        )
+        if cursor.rowcount:
+            return True
+
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    return bool(
+        IdempotencyRecord.objects.filter(key=key, scope=scope)
+        .filter(Q(expires_at__lt=now) | Q(status_code__isnull=True, created_at__lt=stale))
+        .update(
+            request_hash=request_hash,
+            status_code=None,
+            response=None,
+            created_at=now,
+            expires_at=expires_at,
+        )
+    )
+
+
+def idempotent(scope, atomic=True):
+    """
+    Honour the ``Idempotency-Key`` header on a view or view method.
+
+    The first request with a key runs the view in a transaction and stores
+    its response in that same transaction, unless it is a server error.
+    Later requests with the same key and body get the stored response back.
+    A request with the same key but another body gets 422, and one arriving
+    while the first is still running gets 409. Keys are scoped per view and
+    per authenticated user; anonymous requests sending one get 400, as they
+    would all share one key space.
+
+    With ``atomic=False`` the view runs outside a transaction and its
+    response is stored afterwards, for views that only call another service
+    (Razorpay) and should not hold a transaction open while it answers.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > 255:
+                return Response(
+                    {"error": f"{HEADER} must be at most 255 characters."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            if not request.user.is_authenticated:
+                return Response(
+                    {"error": f"{HEADER} requires an authenticated request."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            record_scope = f"{scope}:{request.user.pk}"
+            request_hash = _request_hash(request)
+
+            if not _claim(key, record_scope, request_hash):
+                record = (
+                    IdempotencyRecord.objects.filter(key=key, scope=record_scope)
+                    .only("request_hash", "status_code", "response")
+                    .first()
+                )
+                if record is None:
+                    # Deleted after a failed attempt in the meantime.
+                    return Response(
+                        {"error": "A request with this Idempotency-Key is in progress."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                if record.request_hash != request_hash:
+                    return Response(
+                        {"error": "Idempotency-Key was already used for a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                if record.status_code is None:
+                    return Response(
+                        {"error": "A request with this Idempotency-Key is in progress."},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                response = Response(record.response, status=record.status_code)
+                response["Idempotent-Replayed"] = "true"
+                return response
+
+            # The view's writes and the stored response commit together, so
+            # an error leaves nothing behind that a retry would repeat.
+            try:
+                with transaction.atomic() if atomic else nullcontext():
+                    response = view(*args, **kwargs)
+                    if response.status_code < 500:
+                        IdempotencyRecord.objects.filter(key=key, scope=record_scope).update(
+                            status_code=response.status_code, response=response.data
+                        )
+            except Exception:
+                IdempotencyRecord.objects.filter(key=key, scope=record_scope).delete()
+                raise
+            if response.status_code >= 500:
+                IdempotencyRecord.objects.filter(key=key, scope=record_scope).delete()
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def purge_expired_idempotency_records():
+    """Delete records past their TTL. Returns the number of rows removed."""
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
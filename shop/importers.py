@@ -0,0 +1,239 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import connection, transaction
+
+from .cache import bump_version
+from .models import Category, Product
+
+IMPORT_COLUMNS = (
+    "sku",
+    "name",
+    "description",
+    "price",
+    "stock",
+    "image",
+    "category_id",
+    "active",
+    "deleted",
+)
+MAX_REPORTED_ERRORS = 1000
+# Postgres integer, the column behind Product.stock.
+MAX_STOCK = 2**31 - 1
+
+_TRUE = {"1", "true", "t", "yes", "y"}
+_FALSE = {"0", "false", "f", "no", "n", ""}
+_validate_url = URLValidator()
+UNREAD_REST = "The rest of the file was not imported."
+
+
+class RowError(Exception):
+    pass
+
+
+def iter_records(stream, fmt):
+    """
+    Yield ``(line_number, dict)`` pairs from CSV or JSON Lines text, a
+    stream or any iterable of lines. A line that cannot be read yields a
+    ``RowError`` instead; one that cannot be decoded or parsed as CSV also
+    ends the records, since nothing after it can be trusted.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        # DictReader only updates its line_num after a record was read.
+        except UnicodeDecodeError:
+            yield reader.reader.line_num + 1, RowError(f"Not UTF-8 encoded. {UNREAD_REST}")
+        except csv.Error as exc:
+            yield reader.reader.line_num, RowError(f"Invalid CSV: {exc}. {UNREAD_REST}")
+    elif fmt == "jsonl":
+        line_number = 0
+        try:
+            for line_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    yield line_number, RowError("Invalid JSON.")
+                    continue
+                yield line_number, record
+        except UnicodeDecodeError:
+            yield line_number + 1, RowError(f"Not UTF-8 encoded. {UNREAD_REST}")
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}'.")
+
+
+def _text(record, key, required=True):
+    value = record.get(key)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"'{key}' is required.")
+    if "\x00" in value:
+        raise RowError(f"'{key}' must not contain NUL characters.")
+    return value
+
+
+def _bool(record, key, default):
+    value = record.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False if value else default
+    raise RowError(f"'{key}' must be a boolean.")
+
+
+def clean_record(record, categories):
+    """Validate one input record and return it as a tuple of ``IMPORT_COLUMNS``."""
+    if not isinstance(record, dict):
+        raise RowError("Expected an object.")
+
+    sku = _text(record, "sku")
+    if len(sku) > 64:
+        raise RowError("'sku' must be at most 64 characters.")
+    name = _text(record, "name")
+    if len(name) > 255:
+        raise RowError("'name' must be at most 255 characters.")
+    description = _text(record, "description")
+
+    try:
+        price = Decimal(_text(record, "price"))
+    except InvalidOperation:
+        raise RowError("'price' must be a number.")
+    if not price.is_finite() or price < 0 or price >= Decimal("1e8"):
+        raise RowError("'price' is out of range.")
+    price = price.quantize(Decimal("0.01"))
+
+    stock = _text(record, "stock", required=False) or "0"
+    try:
+        stock = int(stock)
+    except ValueError:
+        raise RowError("'stock' must be an integer.")
+    if stock < 0:
+        raise RowError("'stock' must not be negative.")
+    if stock > MAX_STOCK:
+        raise RowError("'stock' is out of range.")
+
+    image = _text(record, "image")
+    if len(image) > 200:
+        raise RowError("'image' must be at most 200 characters.")
+    try:
+        _validate_url(image)
+    except ValidationError:
+        raise RowError("'image' must be a valid URL.")
+
+    category_name = _text(record, "category", required=False)
+    category_id = None
+    if category_name:
+        try:
+            category_id = categories[category_name]
+        except KeyError:
+            raise RowError(f"Unknown category '{category_name}'.")
+
+    return (
+        sku,
+        name,
+        description,
+        price,
+        stock,
+        image,
+        category_id,
+        _bool(record, "active", True),
+        _bool(record, "deleted", False),
+    )
+
+
+def _copy_rows(cursor, table, columns, rows):
+    raw = cursor.cursor
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    if hasattr(raw, "copy"):  # psycopg 3
+        with raw.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+    else:  # psycopg2
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        raw.copy_expert(f"{sql} WITH (FORMAT csv)", buffer)
+
+
+def _upsert_batch(rows):
+    qn = connection.ops.quote_name
+    table = qn(Product._meta.db_table)
+    columns = [qn(column) for column in IMPORT_COLUMNS]
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns[1:])
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS product_import ("
+            " line integer, sku varchar(64), name varchar(255), description text,"
+            " price numeric(10, 2), stock integer, image varchar(200),"
+            " category_id bigint, active boolean, deleted boolean"
+            ") ON COMMIT DELETE ROWS"
+        )
+        _copy_rows(cursor, "product_import", ["line", *columns], rows)
+        # The same SKU may appear twice in a batch; the last line wins.
+        cursor.execute(
+            f"WITH upserted AS ("
+            f" INSERT INTO {table} ({', '.join(columns)})"
+            f" SELECT DISTINCT ON (sku) {', '.join(columns)}"
+            f" FROM product_import ORDER BY sku, line DESC"
+            f" ON CONFLICT (sku) DO UPDATE SET {updates}"
+            f" RETURNING xmax = 0 AS inserted"
+            f") SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)"
+            f" FROM upserted"
+        )
+        return cursor.fetchone()
+
+
+def import_products(stream, fmt="csv", batch_size=5000):
+    """
+    Upsert products (keyed on ``sku``) from a CSV or JSON Lines text stream.
+
+    Rows are validated in Python, streamed into a temporary staging table
+    with ``COPY`` and merged with one ``INSERT ... ON CONFLICT`` per batch.
+    Invalid rows are skipped and reported; valid rows are still imported.
+    A line that cannot be decoded or parsed ends the import there: it is
+    reported like an invalid row, and everything before it is imported.
+    Each batch commits on its own, so the catalog cache is invalidated after
+    every one rather than once at the end, which an error might never reach.
+    """
+    categories = dict(Category.objects.values_list("name", "id"))
+    report = {"created": 0, "updated": 0, "error_count": 0, "errors": []}
+    batch = []
+
+    def flush():
+        created, updated = _upsert_batch(batch)
+        report["created"] += created
+        report["updated"] += updated
+        batch.clear()
+        if created or updated:
+            # Bulk writes bypass the model signals.
+            transaction.on_commit(lambda: bump_version("catalog"))
+
+    for line_number, record in iter_records(stream, fmt):
+        try:
+            if isinstance(record, RowError):
+                raise record
+            batch.append((line_number, *clean_record(record, categories)))
+        except RowError as exc:
+            report["error_count"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line_number, "error": str(exc)})
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
@@ -0,0 +1,184 @@
+import random
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from .cache import bump_version, mark_stale
+from .models import Product, StockShard
+
+# Stock is the single source of truth for a product unless it is sharded.
+# While ``Product.stock_shards`` is set, the StockShard rows are, and
+# ``Product.stock`` is only a display copy refreshed by sync_sharded_stock().
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        # {product_id: units available}
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for products {sorted(shortages)}.")
+
+
+def _catalog_changed():
+    # Stock is part of the cached catalog responses.
+    transaction.on_commit(lambda: bump_version("catalog"))
+
+
+def _stock_changed():
+    # Bumping the catalog for every sale would empty the whole catalog
+    # cache with each order. Cached responses may show stock up to
+    # STALE_VERSION_MAX_AGE seconds old instead; see cache.mark_stale().
+    transaction.on_commit(lambda: mark_stale("catalog"))
+
+
+def _take_from_shards(product_id, shards, quantity):
+    """
+    Decrement ``quantity`` from the shards of a product. Must run inside
+    ``transaction.atomic()``.
+
+    The fast path is one conditional ``UPDATE`` on a randomly chosen shard.
+    Only when no single shard holds enough are all shards locked (in shard
+    order) and drained one after another.
+    """
+    start = random.randrange(shards)
+    for offset in range(shards):
+        updated = StockShard.objects.filter(
+            product_id=product_id, shard=(start + offset) % shards, stock__gte=quantity
+        ).update(stock=F("stock") - quantity)
+        if updated:
+            return
+
+    locked = list(
+        StockShard.objects.select_for_update()
+        .filter(product_id=product_id, stock__gt=0)
+        .order_by("shard")
+    )
+    available = sum(shard.stock for shard in locked)
+    if available < quantity:
+        raise InsufficientStock({product_id: available})
+    remaining = quantity
+    for shard in locked:
+        taken = min(shard.stock, remaining)
+        StockShard.objects.filter(pk=shard.pk).update(stock=F("stock") - taken)
+        remaining -= taken
+        if not remaining:
+            break
+
+
+def decrement_stock(product, quantity):
+    """
+    Take ``quantity`` units of one product out of stock, raising
+    ``InsufficientStock`` if there are not enough. Must run inside
+    ``transaction.atomic()``.
+
+    The check and the decrement are the same conditional ``UPDATE``, so two
+    concurrent buyers can never both get the last unit, and only the stock
+    column is written.
+    """
+    if product.stock_shards:
+        _take_from_shards(product.id, product.stock_shards, quantity)
+        return
+
+    updated = Product.objects.filter(pk=product.pk, stock__gte=quantity).update(
+        stock=F("stock") - quantity
+    )
+    if not updated:
+        available = Product.objects.filter(pk=product.pk).values_list("stock", flat=True).first()
+        raise InsufficientStock({product.id: available or 0})
+    _stock_changed()
+
+
+def reserve_stock(quantities):
+    """
+    Take ``{product_id: quantity}`` out of stock as one all-or-nothing
+    step. Must run inside ``transaction.atomic()``.
+
+    Unsharded product rows are locked in primary key order, so two
+    checkouts touching the same products can never deadlock, and are then
+    decremented by a single conditional ``UPDATE``. Sharded products go
+    through their shards instead.
+    """
+    product_ids = sorted(quantities)
+    sharded = dict(
+        Product.objects.filter(id__in=product_ids, stock_shards__gt=0).values_list(
+            "id", "stock_shards"
+        )
+    )
+    product_ids = [product_id for product_id in product_ids if product_id not in sharded]
+
+    available = dict(
+        Product.objects.select_for_update()
+        .filter(id__in=product_ids)
+        .order_by("id")
+        .values_list("id", "stock")
+    )
+    shortages = {
+        product_id: available.get(product_id) or 0
+        for product_id in product_ids
+        if (available.get(product_id) or 0) < quantities[product_id]
+    }
+    if shortages:
+        raise InsufficientStock(shortages)
+
+    for product_id, shards in sorted(sharded.items()):
+        _take_from_shards(product_id, shards, quantities[product_id])
+
+    if not product_ids:
+        return
+    table = connection.ops.quote_name(Product._meta.db_table)
+    values = ", ".join(["(%s::bigint, %s::integer)"] * len(product_ids))
+    params = []
+    for product_id in product_ids:
+        params += [product_id, quantities[product_id]]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} AS p SET stock = p.stock - v.quantity"
+            f" FROM (VALUES {values}) AS v (id, quantity)"
+            f" WHERE p.id = v.id AND p.stock >= v.quantity",
+            params,
+        )
+        if cursor.rowcount != len(product_ids):
+            raise InsufficientStock({})
+    _stock_changed()
+
+
+@transaction.atomic
+def shard_stock(product, shards):
+    """Spread a product's current stock evenly over ``shards`` StockShard rows."""
+    product = Product.objects.select_for_update().get(pk=product.pk)
+    if product.stock_shards:
+        unshard_stock(product)
+        product.refresh_from_db()
+
+    total = product.stock or 0
+    StockShard.objects.bulk_create(
+        StockShard(product=product, shard=i, stock=total // shards + (i < total % shards))
+        for i in range(shards)
+    )
+    Product.objects.filter(pk=product.pk).update(stock_shards=shards)
+
+
+@transaction.atomic
+def unshard_stock(product):
+    """Fold a product's shards back into ``Product.stock``."""
+    Product.objects.select_for_update().get(pk=product.pk)
+    total = StockShard.objects.filter(product=product).aggregate(total=Sum("stock"))["total"]
+    StockShard.objects.filter(product=product).delete()
+    Product.objects.filter(pk=product.pk).update(stock=total or 0, stock_shards=0)
+    _catalog_changed()
+
+
+def sync_sharded_stock():
+    """Refresh the display ``Product.stock`` of every sharded product."""
+    product_table = connection.ops.quote_name(Product._meta.db_table)
+    shard_table = connection.ops.quote_name(StockShard._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {product_table} AS p SET stock = s.total"
+            f" FROM (SELECT product_id, SUM(stock) AS total FROM {shard_table}"
+            f" GROUP BY product_id) AS s"
+            f" WHERE p.id = s.product_id AND p.stock_shards > 0 AND p.stock IS DISTINCT FROM s.total"
+        )
+        updated = cursor.rowcount
+    if updated:
+        _stock_changed()
+    return updated
@@ -0,0 +1,91 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from shop.models import Category, Notification, Order, Product, User
+from shop.serializers import (NotificationSerializer, OrderSerializer,
+                              ProductSerializer)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the regular and .values() serialization paths of the hot list "
+        "endpoints. Rows are created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'serializer':<24}{'rows':>8}{'regular':>12}{'values':>12}{'speedup':>10}"
+        )
+        for rows in options["rows"]:
+            with transaction.atomic():
+                self.populate(rows)
+                self.measure(ProductSerializer, Product.objects.select_related("category"), rows)
+                self.measure(OrderSerializer, Order.objects.all(), rows)
+                self.measure(NotificationSerializer, Notification.objects.all(), rows)
+                transaction.set_rollback(True)
+
+    def populate(self, rows):
+        category = Category.objects.create(name="bench-category")
+        user = User.objects.create(username="bench-user", email="bench@example.com")
+        Product.objects.bulk_create(
+            (
+                Product(
+                    name=f"Product {i}",
+                    description="A reasonably long product description. " * 4,
+                    price=Decimal(i % 5000) + Decimal("0.99"),
+                    stock=i % 50,
+                    image=f"https://cdn.example.com/products/{i}.jpg",
+                    category=category,
+                )
+                for i in range(rows)
+            ),
+            batch_size=5000,
+        )
+        product = Product.objects.filter(category=category).first()
+        Order.objects.bulk_create(
+            (
+                Order(
+                    user=user,
+                    product=product,
+                    quantity=1 + i % 3,
+                    name="Bench User",
+                    phone="9876543210",
+                    address_line="1 Bench Street",
+                    city="Kochi",
+                    zip_code="682001",
+                )
+                for i in range(rows)
+            ),
+            batch_size=5000,
+        )
+        Notification.objects.bulk_create(
+            (Notification(user=user, message=f"Notification {i}") for i in range(rows)),
+            batch_size=5000,
+        )
+
+    def measure(self, serializer_class, queryset, rows):
+        renderer = JSONRenderer()
+        queryset = queryset.order_by("id")[:rows]
+
+        started = time.perf_counter()
+        regular = renderer.render(serializer_class(queryset, many=True).data)
+        regular_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        serializer = serializer_class()
+        fast = renderer.render(serializer.represent_values(serializer.values_queryset(queryset)))
+        fast_time = time.perf_counter() - started
+
+        if fast != regular:
+            self.stderr.write(self.style.ERROR(f"{serializer_class.__name__}: output differs"))
+        self.stdout.write(
+            f"{serializer_class.__name__:<24}{rows:>8}{regular_time:>11.3f}s"
+            f"{fast_time:>11.3f}s{regular_time / fast_time:>9.1f}x"
+        )
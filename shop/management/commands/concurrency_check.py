@@ -0,0 +1,151 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from shop.analytics import fold_rollup_deltas, record_orders_created
+from shop.inventory import InsufficientStock, decrement_stock, shard_stock
+from shop.models import Cart, DailySalesRollup, Order, Product, StockShard, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a write path from many threads against the real database and "
+        "check that no update was lost. Creates and removes its own rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=["cart", "stock"])
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=500,
+            help="Units on sale in the 'stock' scenario; keep it below threads * iterations.",
+        )
+        parser.add_argument(
+            "--shards", type=int, default=0, help="Use sharded stock counters ('stock' scenario)."
+        )
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        user = User.objects.create(username=f"concurrency-{tag}", email=f"{tag}@example.com")
+        product = Product.objects.create(
+            name=f"concurrency-{tag}",
+            description="concurrency check",
+            price=1,
+            image="https://example.com/concurrency.png",
+            stock=0,
+        )
+        try:
+            getattr(self, f"check_{options['scenario']}")(user, product, options)
+        finally:
+            product.delete()
+            user.delete()
+
+    def run_threads(self, count, target):
+        errors = []
+        barrier = threading.Barrier(count)
+
+        def worker(index):
+            try:
+                barrier.wait()
+                target(index)
+            except Exception as exc:  # reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f"{len(errors)} workers failed, first error: {errors[0]!r}")
+        return elapsed
+
+    def check_cart(self, user, product, options):
+        threads, iterations = options["threads"], options["iterations"]
+
+        def add_to_cart(index):
+            for _ in range(iterations):
+                Cart.objects.add_item(user.id, product.id, 1)
+
+        elapsed = self.run_threads(threads, add_to_cart)
+
+        expected = threads * iterations
+        quantity = Cart.objects.get(userId=user, productId=product).quantity
+        self.report(expected, quantity, elapsed)
+        if quantity != expected:
+            raise CommandError(f"Lost {expected - quantity} cart increments.")
+
+    def check_stock(self, user, product, options):
+        threads, iterations = options["threads"], options["iterations"]
+        Product.objects.filter(pk=product.pk).update(stock=options["stock"])
+        if options["shards"]:
+            shard_stock(product, options["shards"])
+        product.refresh_from_db()
+
+        sold = [0] * threads
+
+        def buy(index):
+            for _ in range(iterations):
+                try:
+                    with transaction.atomic():
+                        decrement_stock(product, 1)
+                        order = Order.objects.create(
+                            user=user,
+                            product=product,
+                            quantity=1,
+                            name="Concurrency Check",
+                            phone="9999999999",
+                            address_line="-",
+                            city="-",
+                            zip_code="000000",
+                        )
+                        record_orders_created([order])
+                    sold[index] += 1
+                except InsufficientStock:
+                    pass
+
+        elapsed = self.run_threads(threads, buy)
+
+        if options["shards"]:
+            remaining = StockShard.objects.filter(product=product).aggregate(
+                total=Sum("stock")
+            )["total"]
+        else:
+            remaining = Product.objects.get(pk=product.pk).stock
+        orders = Order.objects.filter(product=product).count()
+        attempts = threads * iterations
+        self.stdout.write(
+            f"{attempts} attempts, {orders} orders, {remaining} left in "
+            f"{elapsed:.2f}s ({attempts / elapsed:.0f} attempts/s, "
+            f"{orders / elapsed:.0f} orders/s)"
+        )
+        if orders != sum(sold) or orders + remaining != options["stock"]:
+            raise CommandError(f"Oversold: {orders} orders for {options['stock']} units.")
+        self.stdout.write(self.style.SUCCESS("OK: no oversells."))
+
+        fold_rollup_deltas()
+        counted = DailySalesRollup.objects.filter(product=product).aggregate(total=Sum("orders"))[
+            "total"
+        ]
+        if counted != orders:
+            raise CommandError(f"Sales rollup counted {counted} of {orders} orders.")
+        self.stdout.write(self.style.SUCCESS("OK: sales rollup matches."))
+
+    def report(self, expected, actual, elapsed):
+        self.stdout.write(
+            f"expected {expected}, got {actual} in {elapsed:.2f}s "
+            f"({expected / elapsed:.0f} ops/s)"
+        )
+        if expected == actual:
+            self.stdout.write(self.style.SUCCESS("OK: no lost updates."))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from shop.notifications import (DISPATCHER_HEARTBEAT_EVERY, dispatcher_alive,
+                                dispatcher_stopped, drain_outbox)
+from shop.publisher import publisher
+
+STATS_EVERY = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Store queued notifications and push them to websocket clients. "
+        "Runs until interrupted unless --once is given. Run one or more "
+        "alongside the web servers when CHANNEL_LAYER is redis; while none "
+        "is running the web processes drain the outbox themselves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the outbox and exit.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds to wait when the outbox is empty (default: 0.5).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+        stats_at = time.monotonic() + STATS_EVERY
+        heartbeat_at = 0
+        try:
+            while True:
+                if not options["once"] and time.monotonic() >= heartbeat_at:
+                    dispatcher_alive()
+                    heartbeat_at = time.monotonic() + DISPATCHER_HEARTBEAT_EVERY
+                handled = drain_outbox(batch_size)
+                total += handled
+                if time.monotonic() >= stats_at:
+                    self.stdout.write(f"Publisher: {publisher.stats()}")
+                    stats_at = time.monotonic() + STATS_EVERY
+                if handled == batch_size:
+                    continue
+                if options["once"]:
+                    break
+                close_old_connections()
+                time.sleep(options["interval"])
+        finally:
+            if not options["once"]:
+                dispatcher_stopped()
+        publisher.flush()
+        self.stdout.write(self.style.SUCCESS(f"Dispatched {total} notifications."))
+        self.stdout.write(f"Publisher: {publisher.stats()}")
@@ -0,0 +1,41 @@
+import codecs
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.importers import import_products
+
+
+class Command(BaseCommand):
+    help = "Bulk upsert products (keyed on sku) from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="Input format; defaults to the file extension.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+
+        started = time.monotonic()
+        try:
+            with open(path, "rb") as stream:
+                lines = codecs.iterdecode(stream, "utf-8")
+                report = import_products(lines, fmt, batch_size=options["batch_size"])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report['created']}, updated {report['updated']}, "
+                f"{report['error_count']} rows rejected in "
+                f"{time.monotonic() - started:.2f}s."
+            )
+        )
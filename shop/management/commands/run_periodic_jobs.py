@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from shop.scheduler import get_jobs, run_due_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the periodic jobs of shop.scheduler when they are due. Safe to "
+        "run on every node: each job runs once per interval across all of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run due jobs once and exit.")
+        parser.add_argument(
+            "--job",
+            help="Run this job now, whether it is due or not, and exit.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30,
+            help="Seconds between checks for due jobs (default: 30).",
+        )
+
+    def report(self, run):
+        self.stdout.write(f"{run.name}: {run.last_result} in {run.last_duration:.2f}s")
+
+    def handle(self, *args, **options):
+        if options["job"]:
+            jobs = get_jobs()
+            if options["job"] not in jobs:
+                raise CommandError(f"Unknown job. Choose from: {', '.join(sorted(jobs))}.")
+            run = run_job(jobs[options["job"]], force=True)
+            if run is None:
+                raise CommandError(f"{options['job']} is running on another node.")
+            self.report(run)
+            return
+
+        while True:
+            for run in run_due_jobs():
+                self.report(run)
+            if options["once"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
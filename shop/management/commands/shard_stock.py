@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.cache import bump_if_stale
+from shop.inventory import shard_stock, sync_sharded_stock, unshard_stock
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Switch a hot product to sharded stock counters for a flash sale, fold "
+        "the shards back afterwards, or refresh the displayed stock of all "
+        "sharded products."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_id", type=int, nargs="?")
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument("--shards", type=int, help="Number of shards to spread stock over.")
+        group.add_argument("--off", action="store_true", help="Fold the shards back into stock.")
+        group.add_argument("--sync", action="store_true", help="Refresh Product.stock of sharded products.")
+
+    def handle(self, *args, **options):
+        if options["sync"]:
+            updated = sync_sharded_stock()
+            bump_if_stale("catalog")
+            self.stdout.write(self.style.SUCCESS(f"Refreshed stock of {updated} products."))
+            return
+
+        if options["product_id"] is None:
+            raise CommandError("A product id is required.")
+        try:
+            product = Product.objects.get(pk=options["product_id"])
+        except Product.DoesNotExist:
+            raise CommandError(f"Product {options['product_id']} does not exist.")
+
+        if options["off"]:
+            unshard_stock(product)
+            product.refresh_from_db()
+            self.stdout.write(
+                self.style.SUCCESS(f"'{product}' is unsharded with {product.stock} in stock.")
+            )
+            return
+
+        if options["shards"] < 1:
+            raise CommandError("--shards must be at least 1.")
+        shard_stock(product, options["shards"])
+        self.stdout.write(
+            self.style.SUCCESS(f"'{product}' stock spread over {options['shards']} shards.")
+        )
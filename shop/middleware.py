@@ -0,0 +1,40 @@
+from urllib.parse import parse_qs
+
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def get_token_user(raw_token):
+    """
+    The user of a SimpleJWT access token, or AnonymousUser if the token is
+    missing, expired or forged. The token is only verified, never looked
+    up: the user is a ``TokenUser`` built from its claims (id, username,
+    is_staff), so no database query is made.
+    """
+    if not raw_token:
+        return AnonymousUser()
+    try:
+        return TokenUser(AccessToken(raw_token))
+    except TokenError:
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Sets ``scope["user"]`` for websocket connections from the access token
+    in the ``?token=`` query parameter (browsers cannot set headers on a
+    websocket), or in an ``Authorization: Bearer`` header.
+    """
+
+    async def __call__(self, scope, receive, send):
+        raw_token = parse_qs(scope.get("query_string", b"").decode()).get("token", [None])[0]
+        if not raw_token:
+            headers = dict(scope.get("headers", []))
+            auth_type, _, value = headers.get(b"authorization", b"").decode().partition(" ")
+            if auth_type == "Bearer":
+                raw_token = value.strip()
+        scope = dict(scope, user=get_token_user(raw_token))
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0019_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='audience',
+            field=models.CharField(choices=[('user', 'User'), ('admins', 'All staff users')], default='user', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:35
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0021_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodicJobRun',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('last_started_at', models.DateTimeField()),
+                ('last_finished_at', models.DateTimeField(null=True)),
+                ('last_duration', models.FloatField(null=True)),
+                ('last_result', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+            ],
+        ),
+    ]
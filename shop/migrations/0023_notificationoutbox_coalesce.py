@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0022_periodicjobrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='available_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='coalesce_key',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationoutbox',
+            constraint=models.UniqueConstraint(condition=models.Q(('coalesce_key__isnull', False)), fields=('coalesce_key',), name='notificationoutbox_coalesce_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0023_notificationoutbox_coalesce'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'id'], name='notification_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0025_salesrollupdelta'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='stock_shards',
+            field=models.PositiveSmallIntegerField(db_default=0, default=0),
+        ),
+    ]
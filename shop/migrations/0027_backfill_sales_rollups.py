@@ -0,0 +1,53 @@
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    """
+    Build the rollup rows of every order placed before the rollups existed,
+    as shop.analytics.reconcile_rollups would for the whole order history.
+    """
+    Order = apps.get_model("shop", "Order")
+    DailySalesRollup = apps.get_model("shop", "DailySalesRollup")
+    SalesRollupDelta = apps.get_model("shop", "SalesRollupDelta")
+
+    qn = schema_editor.connection.ops.quote_name
+    schema_editor.execute(f"LOCK TABLE {qn(SalesRollupDelta._meta.db_table)} IN SHARE MODE")
+    SalesRollupDelta.objects.all().delete()
+    DailySalesRollup.objects.all().delete()
+    rows = (
+        Order.objects.annotate(day=TruncDate("date"))
+        .values("day", "product_id", "status")
+        .annotate(
+            total_orders=Count("id"),
+            total_units=Sum("quantity"),
+            total_revenue=Sum(F("quantity") * F("product__price")),
+        )
+        .order_by()
+    )
+    DailySalesRollup.objects.bulk_create(
+        (
+            DailySalesRollup(
+                day=row["day"],
+                product_id=row["product_id"],
+                status=row["status"],
+                orders=row["total_orders"],
+                units=row["total_units"],
+                revenue=row["total_revenue"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0026_product_stock_shards_db_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop, elidable=True),
+    ]
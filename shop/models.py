@@ -1,5 +1,11 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .cache import bump_version
 
 
 class User(AbstractUser):
@@ -29,7 +35,16 @@ class Category(models.Model):
         return self.name
 
 
+class ProductManager(models.Manager):
+    def get_queryset(self):
+        # The search vector is only filtered and ranked on in SQL (see
+        # ProductViewSet._search); loading it would ship every product's
+        # tsvector to Python for nothing.
+        return super().get_queryset().defer("search_vector")
+
+
 class Product(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -44,11 +59,117 @@ class Product(models.Model):
     active = models.BooleanField(default=True)
     deleted = models.BooleanField(default=False)
     stock = models.PositiveIntegerField(default=0, null=True, blank=True)
+    # Number of StockShard rows holding this product's stock during a flash
+    # sale (0 = not sharded); see shop.inventory. A database default too,
+    # since the bulk importer inserts without it.
+    stock_shards = models.PositiveSmallIntegerField(default=0, db_default=0)
+    # Kept up to date by Postgres itself, so bulk writes stay searchable too.
+    search_vector = models.GeneratedField(
+        expression=SearchVector("name", weight="A", config="english")
+        + SearchVector("description", weight="B", config="english"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = ProductManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["category", "id"], name="product_category_id_idx"),
+            models.Index(fields=["price"], name="product_price_idx"),
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class StockShard(models.Model):
+    """
+    One slice of a hot product's stock. Buyers decrement a random shard, so
+    concurrent orders for the same product rarely wait on the same row.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_shard_set")
+    shard = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("product", "shard")
+
+
+class CartQuerySet(models.QuerySet):
+    # How an upsert treats the quantity of a line already in the cart.
+    QUANTITY_UPDATES = {
+        "add": "{table}.quantity + EXCLUDED.quantity",
+        "set": "EXCLUDED.quantity",
+        "max": "GREATEST({table}.quantity, EXCLUDED.quantity)",
+    }
+
+    def _upsert_sql(self, rows, mode):
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        user_column = qn(opts.get_field("userId").column)
+        product_column = qn(opts.get_field("productId").column)
+        table = qn(opts.db_table)
+        quantity = self.QUANTITY_UPDATES[mode].format(table=table)
+        return (
+            f"INSERT INTO {table} ({user_column}, {product_column}, quantity)"
+            f" VALUES {', '.join(['(%s, %s, %s)'] * rows)}"
+            f" ON CONFLICT ({user_column}, {product_column})"
+            f" DO UPDATE SET quantity = {quantity}"
+        )
+
+    def add_item(self, user_id, product_id, quantity):
+        """
+        Add ``quantity`` of a product to a user's cart with a single
+        ``INSERT ... ON CONFLICT DO UPDATE``, so concurrent adds of the same
+        product can never lose an increment.
+
+        Returns ``(cart_item, created)``. The item comes back with
+        ``userId`` and ``productId`` already populated (username and product
+        name only) so callers can notify without further queries.
+        """
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH upserted AS ({self._upsert_sql(1, 'add')}"
+                f" RETURNING id, quantity, xmax = 0 AS created"
+                f") SELECT upserted.id, upserted.quantity, upserted.created, u.username, p.name"
+                f" FROM upserted"
+                f" LEFT JOIN {qn(User._meta.db_table)} u ON u.id = %s"
+                f" LEFT JOIN {qn(Product._meta.db_table)} p ON p.id = %s",
+                [user_id, product_id, quantity, user_id, product_id],
+            )
+            cart_id, new_quantity, created, username, product_name = cursor.fetchone()
+
+        # Raw SQL skips the model signals that keep the cart ETag current.
+        transaction.on_commit(lambda: bump_version(f"cart:{user_id}"))
+
+        cart_item = self.model(id=cart_id, quantity=new_quantity)
+        cart_item.userId = User(id=user_id, username=username)
+        cart_item.productId = Product(id=product_id, name=product_name)
+        return cart_item, created
+
+    def upsert_items(self, user_id, quantities, mode="add"):
+        """
+        Upsert many ``{product_id: quantity}`` lines of one user's cart in a
+        single statement; ``mode`` is a key of ``QUANTITY_UPDATES``.
+        """
+        if not quantities:
+            return 0
+        params = []
+        for product_id, quantity in quantities.items():
+            params += [user_id, product_id, quantity]
+
+        with connection.cursor() as cursor:
+            cursor.execute(self._upsert_sql(len(quantities), mode), params)
+            count = cursor.rowcount
+
+        transaction.on_commit(lambda: bump_version(f"cart:{user_id}"))
+        return count
+
+
 class Cart(models.Model):
     userId = models.ForeignKey(User, on_delete=models.CASCADE, related_name="cartuser")
     productId = models.ForeignKey(
@@ -56,6 +177,8 @@ class Cart(models.Model):
     )
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartQuerySet.as_manager()
+
     class Meta:
         unique_together = ("userId", "productId")
 
@@ -87,6 +210,46 @@ class Order(models.Model):
     zip_code = models.CharField(max_length=10)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="placed")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["date"], name="order_date_idx"),
+            models.Index(fields=["user", "date"], name="order_user_date_idx"),
+            models.Index(fields=["status", "date"], name="order_status_date_idx"),
+        ]
+
+
+class DailySalesRollup(models.Model):
+    """
+    Orders, units and revenue per day, product and order status, kept up to
+    date by shop.analytics as orders are placed and change status.
+    """
+
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="sales_rollups")
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    # Plain integers: a status change of an order placed before the rollup
+    # existed may briefly push a row below zero until it is reconciled.
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("day", "product", "status")
+
+
+class SalesRollupDelta(models.Model):
+    """
+    A change to a DailySalesRollup row not folded in yet. Order writes only
+    ever insert these, so concurrent orders for the same product never wait
+    on a shared rollup row; a periodic job adds them up into the rollup.
+    """
+
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    orders = models.IntegerField()
+    units = models.IntegerField()
+
 
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
@@ -94,5 +257,81 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="notification_user_created_idx"),
+            # Reconnect replay: everything of a user after a given id.
+            models.Index(fields=["user", "id"], name="notification_user_id_idx"),
+            # Only unread rows, so the badge count stays small and index-only.
+            models.Index(
+                fields=["user"],
+                condition=models.Q(is_read=False),
+                name="notification_user_unread_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.message[:30]}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Notifications waiting to be stored and pushed over websockets. Rows are
+    written in the transaction of the change they announce and drained by
+    ``manage.py dispatch_notifications``, or by the web process itself when
+    no dispatcher is running.
+    """
+
+    AUDIENCE_USER = "user"
+    AUDIENCE_ADMINS = "admins"
+    AUDIENCE_CHOICES = [
+        (AUDIENCE_USER, "User"),
+        (AUDIENCE_ADMINS, "All staff users"),
+    ]
+
+    audience = models.CharField(max_length=10, choices=AUDIENCE_CHOICES, default=AUDIENCE_USER)
+    # Empty for the admins audience.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name="+")
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Not dispatched before this time. Rows with the same coalesce_key are
+    # merged while they wait, so a burst of updates becomes one notification.
+    available_at = models.DateTimeField(default=timezone.now)
+    coalesce_key = models.CharField(max_length=100, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["coalesce_key"],
+                condition=models.Q(coalesce_key__isnull=False),
+                name="notificationoutbox_coalesce_key_uniq",
+            ),
+        ]
+
+
+class IdempotencyRecord(models.Model):
+    """
+    The outcome of a request sent with an ``Idempotency-Key`` header. A row
+    with no ``status_code`` is a request still being processed.
+    """
+
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=100)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("key", "scope")
+
+
+class PeriodicJobRun(models.Model):
+    """The last run of each job of shop.scheduler, shared by every node."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    last_started_at = models.DateTimeField()
+    last_finished_at = models.DateTimeField(null=True)
+    last_duration = models.FloatField(null=True)
+    last_result = models.JSONField(null=True, encoder=DjangoJSONEncoder)
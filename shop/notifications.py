@@ -1,35 +1,322 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
 
-from .models import Notification
+from .cache import bump_version, get_cache, get_version, versioned_cache_enabled
+from .models import Notification, NotificationOutbox
+from .publisher import publisher
 
 User = get_user_model()
 
+# Every staff user's socket joins this group, so a message to all admins is
+# one group_send however many admins there are.
+ADMINS_GROUP = "notifications_admins"
+
+# Open sockets per user, kept in the cache by NotificationConsumer. Every
+# open socket refreshes the key each CONNECTIONS_REFRESH seconds, so it only
+# expires once no socket of the user is left to do so, e.g. after a server
+# crashed without running disconnect.
+CONNECTIONS_TIMEOUT = 5 * 60
+CONNECTIONS_REFRESH = 60
+
+PUBLISH_TIMEOUT = 1.0
+
+# dispatch_notifications refreshes this key while it runs. Web processes
+# that see no dispatcher drain the outbox themselves after each commit, so
+# a deployment without one still stores and delivers every notification.
+DISPATCHER_HEARTBEAT_KEY = "outbox:dispatcher"
+DISPATCHER_HEARTBEAT_TIMEOUT = 30
+DISPATCHER_HEARTBEAT_EVERY = 10
+
+
+def user_group(user_id):
+    return f"notifications_{user_id}"
+
+
+def _connections_key(user_id):
+    return f"ws:connections:{user_id}"
+
+
+def connection_opened(user_id):
+    cache = get_cache()
+    key = _connections_key(user_id)
+    cache.add(key, 0, CONNECTIONS_TIMEOUT)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, CONNECTIONS_TIMEOUT)
+    cache.touch(key, CONNECTIONS_TIMEOUT)
+
+
+def connection_alive(user_id):
+    """Keep an open socket's user counted; called every CONNECTIONS_REFRESH."""
+    cache = get_cache()
+    key = _connections_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        # Lost anyway (evicted, cache restarted): this socket at least is open.
+        cache.add(key, 1, CONNECTIONS_TIMEOUT)
+    elif count < 1:
+        # Recreated at 1 with several sockets open, then decremented by
+        # their closes: raise it back to 1, keeping concurrent changes.
+        try:
+            cache.incr(key, 1 - count)
+        except ValueError:
+            cache.add(key, 1, CONNECTIONS_TIMEOUT)
+    cache.touch(key, CONNECTIONS_TIMEOUT)
+
+
+def connection_closed(user_id):
+    try:
+        get_cache().decr(_connections_key(user_id))
+    except ValueError:
+        pass
+
+
+def online_user_ids(user_ids):
+    """
+    The subset of ``user_ids`` worth pushing to. Everyone, unless
+    NOTIFICATION_SKIP_OFFLINE is on, in which case one cache round trip
+    tells who has a socket open.
+    """
+    user_ids = set(user_ids)
+    if not settings.NOTIFICATION_SKIP_OFFLINE or not user_ids:
+        return user_ids
+    counts = get_cache().get_many([_connections_key(user_id) for user_id in user_ids])
+    return {user_id for user_id in user_ids if counts.get(_connections_key(user_id), 0) > 0}
+
+
+def get_unread_count(user_id):
+    """
+    Number of unread notifications of a user, cached under the user's
+    notification version so any create, read or delete invalidates it.
+    Notifications are written by other processes (the outbox dispatcher,
+    the retention job), so without a shared cache it is counted every time.
+    """
+    if not versioned_cache_enabled():
+        return Notification.objects.filter(user_id=user_id, is_read=False).count()
+    scope = f"notifications:{user_id}"
+    key = f"unread:{scope}:{get_version(scope)}"
+    cache = get_cache()
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(key, count, settings.CATALOG_CACHE_TIMEOUT)
+    return count
+
+
+def notifications_changed(user_id):
+    """
+    Call after notifications of a user were updated or deleted in bulk
+    (which sends no signals): once the transaction commits, invalidate the
+    user's cached notification responses and push the new unread count to
+    their sockets.
+    """
+
+    def push():
+        bump_version(f"notifications:{user_id}")
+        if not online_user_ids([user_id]):
+            return
+        publisher.publish(
+            user_group(user_id),
+            {"type": "unread_count", "content": {"unread": get_unread_count(user_id)}},
+        )
+
+    transaction.on_commit(push)
+
 
 def save_and_notify(user, message):
-    Notification.objects.create(user=user, message=message)
+    """
+    Queue a notification for ``user``. Only the outbox row is written here,
+    inside the caller's transaction; drain_outbox() stores and pushes it.
+    """
+    NotificationOutbox.objects.create(user=user, message=message)
+    _dispatch_locally()
+
 
+def dispatcher_alive():
+    """Called by dispatch_notifications while it runs; see dispatcher_running()."""
+    get_cache().set(DISPATCHER_HEARTBEAT_KEY, time.time(), DISPATCHER_HEARTBEAT_TIMEOUT)
 
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"notifications_{user.username}",
-        {
-            "type": "send_notification",
-            "content": {"message": message},
-        },
+
+def dispatcher_stopped():
+    get_cache().delete(DISPATCHER_HEARTBEAT_KEY)
+
+
+def dispatcher_running():
+    return get_cache().get(DISPATCHER_HEARTBEAT_KEY) is not None
+
+
+def _dispatch_locally(delay=0):
+    # With the in-memory channel layer only this process can reach the
+    # sockets, and without a dispatcher nobody else drains the outbox, so
+    # this process drains it itself once the transaction commits, or
+    # ``delay`` seconds after that.
+    if settings.CHANNEL_LAYER != "memory" and dispatcher_running():
+        return
+    if delay:
+        transaction.on_commit(lambda: _drain_later(delay))
+    else:
+        transaction.on_commit(drain_outbox)
+
+
+def _drain_later(delay):
+    def drain():
+        try:
+            drain_outbox()
+        finally:
+            connection.close()
+
+    async def running_loop():
+        return asyncio.get_running_loop()
+
+    # The server's event loop owns the in-memory layer, so the drain runs
+    # from there. Without one (a shell, a WSGI server) async_to_sync used a
+    # throwaway loop, and a plain timer at least stores the notification.
+    loop = async_to_sync(running_loop)()
+    if loop.is_closed():
+        timer = threading.Timer(delay, drain)
+        timer.daemon = True
+        timer.start()
+        return
+    loop.call_soon_threadsafe(
+        loop.call_later,
+        delay,
+        lambda: loop.create_task(sync_to_async(drain, thread_sensitive=False)()),
     )
 
 
+def save_and_notify_coalesced(user, message, key, window):
+    """
+    Queue a notification that is held for ``window`` seconds. Another one
+    with the same ``key`` queued meanwhile replaces its message instead of
+    adding a row, so only the latest is delivered, when the first one's
+    window ends.
+    """
+    now = timezone.now()
+    table = connection.ops.quote_name(NotificationOutbox._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table}"
+            f" (audience, user_id, message, created_at, available_at, coalesce_key)"
+            f" VALUES (%s, %s, %s, %s, %s, %s)"
+            f" ON CONFLICT (coalesce_key) WHERE coalesce_key IS NOT NULL"
+            f" DO UPDATE SET message = EXCLUDED.message"
+            f" RETURNING (xmax = 0)",
+            [
+                NotificationOutbox.AUDIENCE_USER,
+                user.pk,
+                message,
+                now,
+                now + timedelta(seconds=window),
+                key,
+            ],
+        )
+        inserted = cursor.fetchone()[0]
+    # Only the row's first write schedules its delivery; later ones in the
+    # window just replace the message.
+    if inserted:
+        _dispatch_locally(delay=window)
+
+
+def save_and_notify_admins(message):
+    """
+    Queue one notification for every staff user. It is stored per admin
+    but pushed once, to the shared admins group.
+    """
+    NotificationOutbox.objects.create(audience=NotificationOutbox.AUDIENCE_ADMINS, message=message)
+    _dispatch_locally()
+
+
+def drain_outbox(batch_size=500):
+    """
+    Move up to ``batch_size`` outbox rows into Notification and push them to
+    their websocket groups. Returns the number of rows handled.
+
+    Rows are claimed with ``SKIP LOCKED``, so several dispatchers can run at
+    once without sending anything twice. Pushing happens after the commit,
+    through the publisher: a failed or dropped push leaves the notification
+    stored but not delivered live (the client gets it on reconnect).
+    """
+    with transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(available_at__lte=timezone.now())
+            .order_by("id")[:batch_size]
+        )
+        if not entries:
+            return 0
+        admin_ids = []
+        if any(entry.audience == NotificationOutbox.AUDIENCE_ADMINS for entry in entries):
+            admin_ids = list(User.objects.filter(is_staff=True).values_list("id", flat=True))
+        stored = {
+            entry.id: [
+                Notification(user_id=user_id, message=entry.message)
+                for user_id in (
+                    admin_ids
+                    if entry.audience == NotificationOutbox.AUDIENCE_ADMINS
+                    else [entry.user_id]
+                )
+            ]
+            for entry in entries
+        }
+        Notification.objects.bulk_create(
+            [notification for notifications in stored.values() for notification in notifications],
+            batch_size=1000,
+        )
+        NotificationOutbox.objects.filter(id__in=[entry.id for entry in entries]).delete()
+        # bulk_create skips the post_save signal that invalidates these.
+        user_ids = {entry.user_id for entry in entries if entry.user_id} | set(admin_ids)
+        transaction.on_commit(
+            lambda: [bump_version(f"notifications:{user_id}") for user_id in user_ids]
+        )
+
+    online = online_user_ids(entry.user_id for entry in entries if entry.user_id)
+    for entry in entries:
+        notifications = stored[entry.id]
+        if not notifications:
+            continue
+        if entry.audience == NotificationOutbox.AUDIENCE_USER and entry.user_id not in online:
+            continue
+        content = {
+            "message": entry.message,
+            "created_at": notifications[0].created_at.isoformat(),
+            # Per recipient, so a socket can match the frame to its own row
+            # (and skip it if a reconnect replay already sent it).
+            "ids": {str(n.user_id): n.id for n in notifications},
+        }
+        group = (
+            ADMINS_GROUP
+            if entry.audience == NotificationOutbox.AUDIENCE_ADMINS
+            else user_group(entry.user_id)
+        )
+        # Waits briefly for room in the queue, so a backed-up channel layer
+        # slows the dispatcher down before anything is dropped.
+        publisher.publish(
+            group, {"type": "send_notification", "content": content}, timeout=PUBLISH_TIMEOUT
+        )
+    return len(entries)
+
+
 def notify_order_created_to_admins(order):
-    # Find all staff/admin users
-    admin = User.objects.get(is_staff=True)
-    save_and_notify(
-        admin,
-        f"New order {order.id} placed by {order.user.username} for '{order.product.name}'.",
+    save_and_notify_admins(
+        f"New order {order.id} placed by {order.user.username} for '{order.product.name}'."
     )
 
 
+def notify_checkout_to_admins(user, orders):
+    order_ids = ", ".join(str(order.id) for order in orders)
+    save_and_notify_admins(f"New orders {order_ids} placed by {user.username}.")
+
+
 def notify_user_order_created(user, order):
     save_and_notify(
         user,
@@ -37,12 +324,25 @@ def notify_user_order_created(user, order):
     )
 
 
+def notify_user_checkout_completed(user, orders):
+    order_ids = ", ".join(str(order.id) for order in orders)
+    save_and_notify(user, f"Orders {order_ids} placed successfully.")
+
+
 def notify_user_order_status_changed(user, order):
     save_and_notify(user, f"Order {order.id} status updated to '{order.status}'.")
 
 
 def notify_user_cart_updated(user, cart_item):
-    save_and_notify(
+    # Collapses a burst of "+1" taps on one product into a single message
+    # with the final quantity.
+    save_and_notify_coalesced(
         user,
         f"'{cart_item.productId.name}' added to your cart. Quantity: {cart_item.quantity}.",
+        key=f"cart:{user.pk}:{cart_item.productId.pk}",
+        window=settings.CART_NOTIFICATION_WINDOW,
     )
+
+
+def notify_user_cart_batch_updated(user, line_count):
+    save_and_notify(user, f"Your cart was updated ({line_count} items).")
@@ -0,0 +1,44 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Cursor pagination that only kicks in when the client asks for it with
+    ``?page_size=`` (or follows a ``?cursor=`` link), so existing clients
+    that expect a plain list keep working.
+    """
+
+    page_size = None
+    default_page_size = 24
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        page_size = super().get_page_size(request)
+        if page_size is None and self.cursor_query_param in request.query_params:
+            return self.default_page_size
+        return page_size
+
+
+class ProductCursorPagination(OptionalCursorPagination):
+    # Ordered by the primary key so every page is an index range scan,
+    # also when filtered by category (see the product_category_id index).
+    ordering = "id"
+
+
+class OrderCursorPagination(OptionalCursorPagination):
+    # Newest first; served by the (user, date) and (status, date) indexes.
+    ordering = "-date"
+
+
+class NotificationCursorPagination(OptionalCursorPagination):
+    # Newest first; served by the (user, created_at) index.
+    ordering = "-created_at"
+
+
+class SearchPagination(PageNumberPagination):
+    # Ranked results have no stable unique key to put in a cursor, and
+    # nobody pages far into a search, so plain page numbers are fine here.
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
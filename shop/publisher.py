@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Sync code (views, the outbox dispatcher) hands websocket messages to the
+# publisher instead of calling async_to_sync(group_send) once per message.
+# A background thread with its own event loop takes whatever has queued up
+# and sends it as one batch of concurrent group_sends, so a burst of N
+# notifications costs a few round trips instead of N sequential ones.
+
+
+class Publisher:
+    def __init__(self, maxsize, batch_size):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            "published": 0,
+            "failed": 0,
+            "dropped": 0,
+            "batches": 0,
+            "largest_batch": 0,
+            "high_water": 0,
+        }
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker, which does not
+        # inherit the parent's thread.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.maxsize)
+            self._thread = threading.Thread(
+                target=self._run, name="notification-publisher", daemon=True
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def publish(self, group, event, timeout=None):
+        """
+        Queue ``event`` for ``group``. Returns False if it was dropped
+        because the queue stayed full: immediately by default, or after
+        waiting up to ``timeout`` seconds for room.
+
+        With the in-memory channel layer the message is sent right away
+        instead: that layer lives on the server's event loop and a send
+        costs no round trip. False then means the send failed.
+        """
+        channel_layer = get_channel_layer()
+        if isinstance(channel_layer, InMemoryChannelLayer):
+            try:
+                async_to_sync(channel_layer.group_send)(group, event)
+            except Exception as exc:
+                self._count(failed=1)
+                logger.error(f"Push to {group} failed: {exc!r}")
+                return False
+            self._count(published=1)
+            return True
+
+        self._ensure_started()
+        try:
+            if timeout is None:
+                self._queue.put_nowait((group, event))
+            else:
+                self._queue.put((group, event), timeout=timeout)
+        except queue.Full:
+            self._count(dropped=1)
+            return False
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats["high_water"] = max(self._stats["high_water"], depth)
+        return True
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        channel_layer = get_channel_layer()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                results = loop.run_until_complete(
+                    asyncio.gather(
+                        *(channel_layer.group_send(group, event) for group, event in batch),
+                        return_exceptions=True,
+                    )
+                )
+                errors = [result for result in results if isinstance(result, Exception)]
+            except Exception as exc:
+                errors = [exc] * len(batch)
+            if errors:
+                logger.error(f"{len(errors)} of {len(batch)} pushes failed: {errors[0]!r}")
+            with self._lock:
+                self._stats["published"] += len(batch) - len(errors)
+                self._stats["failed"] += len(errors)
+                self._stats["batches"] += 1
+                self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far has been sent. Returns True if it was."""
+        if self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize() if self._pid == os.getpid() else 0
+        stats["capacity"] = self.maxsize
+        return stats
+
+
+publisher = Publisher(
+    maxsize=settings.NOTIFICATION_PUBLISHER_QUEUE_SIZE,
+    batch_size=settings.NOTIFICATION_PUBLISHER_BATCH_SIZE,
+)
@@ -3,5 +3,7 @@ from django.urls import re_path
 from .consumers import NotificationConsumer
 
 websocket_urlpatterns = [
+    re_path(r"ws/notifications/$", NotificationConsumer.as_asgi()),
+    # Older clients put their username in the path; it must match the token.
     re_path(r"ws/notifications/(?P<username>\w+)/$", NotificationConsumer.as_asgi()),
 ]
@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import PeriodicJobRun
+
+logger = logging.getLogger(__name__)
+
+# A minimal periodic job runner for ``manage.py run_periodic_jobs``, which
+# may run on every node. A job runs at most once per interval across all of
+# them: the last start time lives in PeriodicJobRun, and a Postgres
+# advisory lock keeps two nodes from running the same job at once.
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    every: timedelta
+    func: Callable[[], object]
+
+
+_jobs = {}
+
+
+def register(name, every):
+    """Decorator adding ``func`` to the schedule, to run every ``every``."""
+
+    def decorator(func):
+        _jobs[name] = Job(name, every, func)
+        return func
+
+    return decorator
+
+
+def get_jobs():
+    # Jobs register themselves when their module is imported.
+    from . import tasks  # noqa: F401
+
+    return dict(_jobs)
+
+
+def _lock_id(name):
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def _is_due(job, now):
+    run = PeriodicJobRun.objects.filter(name=job.name).only("last_started_at").first()
+    return run is None or now - run.last_started_at >= job.every
+
+
+def run_job(job, force=False):
+    """
+    Run ``job`` if it is due (or ``force``) and no other node is running it.
+    Returns the PeriodicJobRun of this run, or None if it was skipped.
+    """
+    lock_id = _lock_id(job.name)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+        if not cursor.fetchone()[0]:
+            return None
+    try:
+        # Checked again under the lock: another node may have just run it.
+        started_at = timezone.now()
+        if not force and not _is_due(job, started_at):
+            return None
+        PeriodicJobRun.objects.update_or_create(
+            name=job.name,
+            defaults={"last_started_at": started_at, "last_finished_at": None},
+        )
+
+        started = time.monotonic()
+        try:
+            result = job.func()
+        except Exception as exc:
+            logger.exception(f"Periodic job {job.name} failed")
+            result = {"error": repr(exc)}
+        run = PeriodicJobRun(
+            name=job.name,
+            last_started_at=started_at,
+            last_finished_at=timezone.now(),
+            last_duration=round(time.monotonic() - started, 3),
+            last_result=result,
+        )
+        run.save()
+        return run
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+
+def run_due_jobs():
+    """Run every job that is due. Returns the runs that happened."""
+    runs = []
+    for job in get_jobs().values():
+        run = run_job(job)
+        if run is not None:
+            runs.append(run)
+    return runs
@@ -2,18 +2,180 @@
 import re
 
 from django.contrib.auth import get_user_model
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from .models import Cart, Category, Order, Product, Wishlist,Notification
 
 
+class SparseFieldsMixin:
+    """
+    Lets clients trim read responses with ``?fields=id,name,price`` or
+    ``?omit=description``. Writes always use the full field set. Unknown
+    field names are a 400, so a typo does not silently return empty objects.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_sparse = False
+
+        request = self.context.get("request")
+        if request is None or request.method != "GET":
+            return
+
+        fields = self._requested_fields(request, "fields")
+        omit = self._requested_fields(request, "omit")
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+            self.is_sparse = True
+        if omit:
+            for name in omit & set(self.fields):
+                self.fields.pop(name)
+            self.is_sparse = True
+
+    def _requested_fields(self, request, param):
+        names = {name for name in request.query_params.get(param, "").split(",") if name}
+        unknown = names - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {param: [f"Unknown field(s): {', '.join(sorted(unknown))}."]}
+            )
+        return names
+
+    def get_model_field_paths(self):
+        """The model fields (as ``.only()`` paths) the kept fields read."""
+        paths = ["pk"]
+        for field in self.fields.values():
+            if field.write_only:
+                continue
+            source = field.source.replace(".", "__")
+            if isinstance(field, serializers.SlugRelatedField):
+                source = f"{source}__{field.slug_field}"
+            paths.append(source)
+        return paths
+
+
+# Fields whose to_representation() returns a database value unchanged.
+_PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.SlugRelatedField,
+)
+
+
+def _datetime_converter(field):
+    """
+    ``DateTimeField.to_representation`` with the format and timezone looked
+    up once instead of per value. Anything but aware datetimes rendered as
+    ISO 8601 goes through the field itself.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or tz is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+class ValuesSerializerMixin:
+    """
+    Read-only fast path that builds output rows from ``.values()`` dicts
+    instead of model instances.
+
+    The plan is worked out once per serializer: plain columns are copied as
+    they come from the database, and only fields that really convert their
+    value (decimals, datetimes, choices) call ``to_representation``. The
+    result renders to the same JSON as ``serializer.data``.
+    """
+
+    def get_values_plan(self):
+        if hasattr(self, "_values_plan"):
+            return self._values_plan
+
+        plan = []
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField)):
+                plan = None
+                break
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field:
+                plan = None
+                break
+            if field.source == "*" or isinstance(field, serializers.SerializerMethodField):
+                plan = None
+                break
+
+            path = field.source.replace(".", "__")
+            if isinstance(field, serializers.SlugRelatedField):
+                path = f"{path}__{field.slug_field}"
+            convert = None
+            if isinstance(field, serializers.DateTimeField):
+                convert = _datetime_converter(field)
+            elif not isinstance(field, _PASSTHROUGH_FIELDS) or isinstance(
+                field, serializers.ChoiceField
+            ):
+                convert = field.to_representation
+            plan.append((name, path, convert))
+
+        self._values_plan = plan
+        return plan
+
+    def supports_values(self):
+        return self.get_values_plan() is not None
+
+    def values_queryset(self, queryset, extra=()):
+        paths = [path for _, path, _ in self.get_values_plan()]
+        return queryset.values(*dict.fromkeys([*paths, *extra]))
+
+    def represent_values(self, rows):
+        plan = self.get_values_plan()
+        data = []
+        for row in rows:
+            item = {}
+            for name, path, convert in plan:
+                value = row[path]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+
+def only_sparse_fields(queryset, serializer):
+    """Restrict ``queryset`` to the columns a sparse serializer will read."""
+    serializer = getattr(serializer, "child", serializer)
+    if not getattr(serializer, "is_sparse", False):
+        return queryset
+
+    paths = serializer.get_model_field_paths()
+    related = {path.split("__")[0] for path in paths if "__" in path}
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*paths)
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
         token["username"] = user.username
         token["role"] = user.role
+        # Read by the websocket middleware, which never loads the user.
+        token["is_staff"] = user.is_staff
         return token
 
     def validate(self, attrs):
@@ -36,7 +198,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=8)
     password2 = serializers.CharField(write_only=True, required=True)
 
@@ -126,7 +288,9 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name"]
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(
+    SparseFieldsMixin, ValuesSerializerMixin, serializers.ModelSerializer
+):
     category = serializers.SlugRelatedField(
         slug_field="name",
         queryset=Category.objects.all()
@@ -136,6 +300,7 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             "id",
+            "sku",
             "name",
             "description",
             "price",
@@ -159,18 +324,44 @@ class CartSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class OrderSerializer(serializers.ModelSerializer):
-    name = serializers.CharField(max_length=255, required=True)
-    phone = serializers.CharField(max_length=15, required=True)
-    address_line = serializers.CharField(required=True)
-    city = serializers.CharField(max_length=100, required=True)
-    zip_code = serializers.CharField(max_length=10, required=True)
-    quantity = serializers.IntegerField(min_value=1, required=True)
+class CartBatchItemSerializer(serializers.Serializer):
+    productId = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    op = serializers.ChoiceField(choices=["add", "set", "remove"], default="add")
 
-    class Meta:
-        model = Order
-        fields = "__all__"
+    def validate(self, attrs):
+        if attrs["op"] != "remove" and attrs.get("quantity") is None:
+            raise serializers.ValidationError({"quantity": "This field is required."})
+        if attrs["op"] == "add" and attrs["quantity"] < 1:
+            raise serializers.ValidationError({"quantity": "Must be at least 1 to add."})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    userId = serializers.IntegerField(min_value=1)
+    items = serializers.ListField(
+        child=CartBatchItemSerializer(), allow_empty=False, max_length=200
+    )
+
+    def validate_items(self, items):
+        product_ids = [item["productId"] for item in items]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Each product may appear only once.")
+        return items
+
+
+class CartMergeItemSerializer(serializers.Serializer):
+    productId = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
 
+
+class CartMergeSerializer(serializers.Serializer):
+    userId = serializers.IntegerField(min_value=1)
+    items = serializers.ListField(child=CartMergeItemSerializer(), max_length=200)
+    strategy = serializers.ChoiceField(choices=["sum", "max"], default="sum")
+
+
+class ShippingDetailsMixin:
     def validate_phone(self, value):
         if not value.isdigit() or len(value) < 10:
             raise serializers.ValidationError(
@@ -184,7 +375,61 @@ class OrderSerializer(serializers.ModelSerializer):
         return value
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class OrderSerializer(
+    ShippingDetailsMixin,
+    SparseFieldsMixin,
+    ValuesSerializerMixin,
+    serializers.ModelSerializer,
+):
+    name = serializers.CharField(max_length=255, required=True)
+    phone = serializers.CharField(max_length=15, required=True)
+    address_line = serializers.CharField(required=True)
+    city = serializers.CharField(max_length=100, required=True)
+    zip_code = serializers.CharField(max_length=10, required=True)
+    quantity = serializers.IntegerField(min_value=1, required=True)
+
+    class Meta:
+        model = Order
+        fields = "__all__"
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CheckoutSerializer(ShippingDetailsMixin, serializers.Serializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    name = serializers.CharField(max_length=255)
+    phone = serializers.CharField(max_length=15)
+    address_line = serializers.CharField()
+    city = serializers.CharField(max_length=100)
+    zip_code = serializers.CharField(max_length=10)
+    # Defaults to the user's whole cart.
+    items = serializers.ListField(
+        child=CheckoutItemSerializer(), required=False, allow_empty=False, max_length=200
+    )
+
+
+class NotificationSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'message', 'created_at', 'is_read']
\ No newline at end of file
+        fields = ['id', 'message', 'created_at', 'is_read']
+
+class NotificationMarkReadSerializer(serializers.Serializer):
+    """Exactly one of ``all``, ``ids`` or ``up_to`` (a notification id)."""
+
+    all = serializers.BooleanField(required=False)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500,
+        required=False,
+    )
+    up_to = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        chosen = [name for name in ("all", "ids", "up_to") if attrs.get(name)]
+        if len(chosen) != 1:
+            raise serializers.ValidationError("Send exactly one of all, ids or up_to.")
+        return attrs
@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .analytics import record_order_deleted
+from .cache import bump_version
+from .models import Cart, Category, Notification, Order, Product
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    # Bump after commit, otherwise a concurrent reader could cache the old
+    # rows under the new version.
+    transaction.on_commit(lambda: bump_version("catalog"))
+
+
+@receiver([post_save, post_delete], sender=Cart)
+def invalidate_cart(sender, instance, **kwargs):
+    user_id = instance.userId_id
+    transaction.on_commit(lambda: bump_version(f"cart:{user_id}"))
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def invalidate_notifications(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_version(f"notifications:{user_id}"))
+
+
+@receiver(post_delete, sender=Order)
+def count_deleted_order(sender, instance, origin=None, **kwargs):
+    # Also for orders deleted along with their user. Not when the product
+    # (or its category) goes too: its rollup rows are deleted with it, and
+    # a delta left behind would point at the deleted product.
+    if issubclass(getattr(origin, "model", type(origin)), (Product, Category)):
+        return
+    record_order_deleted(instance)
@@ -1,7 +1,114 @@
+import time
 from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
 from django.utils.timezone import now
+
+from .analytics import fold_rollup_deltas, reconcile_rollups
+from .cache import bump_version
+from .idempotency import purge_expired_idempotency_records
+from .inventory import sync_sharded_stock
 from .models import Notification
+from .scheduler import register
+
+
+def delete_in_chunks(queryset, chunk_size=1000, pause=0.0):
+    """
+    Delete the rows of ``queryset`` ``chunk_size`` at a time, each chunk its
+    own short statement and transaction, so a large delete never holds its
+    locks for long. Signals are not sent. Returns the number of rows deleted.
+    """
+    model = queryset.model
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    subquery, params = queryset.order_by().values("pk")[:chunk_size].query.sql_with_params()
+
+    total = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({subquery})", params)
+            deleted = cursor.rowcount
+        total += deleted
+        if deleted < chunk_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+@register("notification_retention", every=timedelta(hours=1))
+def delete_old_notifications(days=None, batch_size=None, pause=None):
+    """
+    Delete notifications older than ``NOTIFICATION_RETENTION_DAYS``.
+
+    The table is walked in primary key ranges of ``batch_size`` from the
+    oldest row, one short ``DELETE`` per range, with ``pause`` seconds in
+    between. Ids grow with ``created_at``, so the walk stops at the first
+    range that starts after the cutoff. Returns what was done, for the job
+    log.
+    """
+    days = settings.NOTIFICATION_RETENTION_DAYS if days is None else days
+    batch_size = batch_size or settings.NOTIFICATION_RETENTION_BATCH_SIZE
+    pause = settings.NOTIFICATION_RETENTION_PAUSE if pause is None else pause
+    cutoff = now() - timedelta(days=days)
+    table = connection.ops.quote_name(Notification._meta.db_table)
+
+    started = time.monotonic()
+    deleted = batches = 0
+    user_ids = set()
+    oldest = Notification.objects.order_by("id").values_list("id", "created_at").first()
+    low = oldest[0] if oldest and oldest[1] < cutoff else None
+    while low is not None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id >= %s AND id < %s AND created_at < %s"
+                f" RETURNING user_id",
+                [low, low + batch_size, cutoff],
+            )
+            affected = [row[0] for row in cursor.fetchall()]
+        deleted += len(affected)
+        user_ids.update(affected)
+        batches += 1
+        following = (
+            Notification.objects.filter(id__gte=low + batch_size)
+            .order_by("id")
+            .values_list("id", "created_at")
+            .first()
+        )
+        low = following[0] if following and following[1] < cutoff else None
+        if low is not None and pause:
+            time.sleep(pause)
+
+    # Raw deletes send no signals.
+    for user_id in user_ids:
+        bump_version(f"notifications:{user_id}")
+    return {
+        "deleted": deleted,
+        "batches": batches,
+        "cutoff": cutoff.isoformat(),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+@register("idempotency_purge", every=timedelta(hours=1))
+def purge_idempotency_records():
+    return {"deleted": purge_expired_idempotency_records()}
+
+
+@register("sales_rollup_reconcile", every=timedelta(days=1))
+def reconcile_recent_sales_rollups():
+    # Yesterday is complete by now, and today's rows pick up price edits.
+    today = timezone.localdate()
+    return {"rows": reconcile_rollups(today - timedelta(days=1), today)}
+
+
+@register("sales_rollup_fold", every=timedelta(minutes=1))
+def fold_sales_rollup_deltas():
+    return {"folded": fold_rollup_deltas()}
+
+
+@register("sharded_stock_sync", every=timedelta(minutes=1))
+def sync_sharded_stock_job():
+    return {"updated": sync_sharded_stock()}
 
-def delete_old_notifications():
-    cutoff = now() - timedelta(days=7)
-    Notification.objects.filter(created_at__lt=cutoff).delete()
@@ -0,0 +1,56 @@
+import threading
+
+from django.db import connection
+
+from shop.models import Product, User
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+SHIPPING = {
+    "name": "Test Buyer",
+    "phone": "9999999999",
+    "address_line": "1 Test Street",
+    "city": "Kochi",
+    "zip_code": "682001",
+}
+
+
+def make_product(**fields):
+    return Product.objects.create(
+        **{
+            "name": "Widget",
+            "description": "A widget",
+            "price": "10.50",
+            "image": "https://example.com/widget.png",
+            "stock": 10,
+            **fields,
+        }
+    )
+
+
+def make_user(username="buyer", **fields):
+    return User.objects.create_user(
+        username=username, password="secret", email=f"{username}@example.com", **fields
+    )
+
+
+def run_concurrently(count, target):
+    """Run ``target(index)`` in ``count`` threads started together."""
+    errors = []
+    barrier = threading.Barrier(count)
+
+    def worker(index):
+        try:
+            barrier.wait()
+            target(index)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
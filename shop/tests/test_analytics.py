@@ -0,0 +1,93 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shop.analytics import fold_rollup_deltas, record_orders_created, sales_report
+from shop.models import DailySalesRollup, Order, SalesRollupDelta
+
+from .helpers import IN_MEMORY_LAYER, SHIPPING, make_product, make_user
+
+backfill = import_module("shop.migrations.0027_backfill_sales_rollups")
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        # Foreign keys are checked at commit, which a TestCase never reaches.
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        self.user = make_user()
+        self.product = make_product(price="2.50")
+        self.today = timezone.localdate()
+
+    def place(self, *quantities, user=None, product=None):
+        orders = [
+            Order.objects.create(
+                user=user or self.user, product=product or self.product, quantity=quantity,
+                **SHIPPING,
+            )
+            for quantity in quantities
+        ]
+        record_orders_created(orders)
+        return orders
+
+    def totals(self):
+        report = sales_report(self.today, self.today)
+        return (report[0]["orders"], report[0]["units"]) if report else (0, 0)
+
+    def test_report_includes_unfolded_deltas(self):
+        self.place(1, 3)
+        before = sales_report(self.today, self.today)
+        self.assertEqual(self.totals(), (2, 4))
+
+        # One delta row: both orders share a (day, product, status) key.
+        self.assertEqual(fold_rollup_deltas(), 1)
+        self.assertFalse(SalesRollupDelta.objects.exists())
+        self.assertEqual(DailySalesRollup.objects.get().orders, 2)
+        self.assertEqual(sales_report(self.today, self.today), before)
+
+    def test_deleted_orders_are_taken_out(self):
+        order, _ = self.place(1, 3)
+        order.delete()
+        self.assertEqual(self.totals(), (1, 3))
+
+        other = make_user("other")
+        self.place(5, user=other)
+        other.delete()
+        self.assertEqual(self.totals(), (1, 3))
+
+    def test_deleting_the_product_leaves_no_delta_behind(self):
+        self.place(1)
+        fold_rollup_deltas()
+        self.place(2)
+        self.product.delete()
+        self.assertFalse(SalesRollupDelta.objects.exists())
+        self.assertFalse(DailySalesRollup.objects.exists())
+
+    def test_backfill_counts_orders_placed_before_the_rollups(self):
+        Order.objects.create(user=self.user, product=self.product, quantity=2, **SHIPPING)
+        self.place(3)
+        with connection.schema_editor() as editor:
+            backfill.backfill_sales_rollups(apps, editor)
+        self.assertFalse(SalesRollupDelta.objects.exists())
+        self.assertEqual(self.totals(), (2, 5))
+        self.assertEqual(sales_report(self.today, self.today)[0]["revenue"], 12.5)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class OrderDeleteApiTests(TestCase):
+    def test_api_delete_is_counted_once(self):
+        user, product = make_user(), make_product()
+        response = APIClient().post(
+            "/api/order/",
+            {"user": user.id, "product": product.id, "quantity": 2, **SHIPPING},
+            format="json",
+        )
+        today = timezone.localdate()
+        self.assertEqual(sales_report(today, today)[0]["orders"], 1)
+        APIClient().delete(f"/api/order/{response.json()['id']}/")
+        self.assertEqual(sales_report(today, today)[0]["orders"], 0)
@@ -0,0 +1,67 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .helpers import IN_MEMORY_LAYER, make_product, make_user
+
+
+@override_settings(DEBUG=True, CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.client = APIClient()
+        self.user = make_user()
+        self.product = make_product()
+
+    def test_cart_etag_answers_304_until_the_cart_changes(self):
+        url = f"/api/cart/?userId={self.user.id}"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/cart/", {"userId": self.user.id, "productId": self.product.id}, format="json"
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_product_edit_invalidates_the_catalog(self):
+        etag = self.client.get("/api/products/")["ETag"]
+        self.assertEqual(
+            self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Renamed"
+            self.product.save()
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["name"], "Renamed")
+
+    @override_settings(
+        DEBUG=False,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    )
+    def test_no_etags_without_a_shared_cache(self):
+        response = self.client.get(f"/api/cart/?userId={self.user.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+
+@override_settings(DEBUG=True, ALLOWED_HOSTS=["testserver", "shop.example.com"])
+class CachedResponseTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        for name in ("A", "B"):
+            make_product(name=name)
+
+    def test_cached_pages_keep_the_links_of_their_own_host(self):
+        client = APIClient()
+        for secure, host, prefix in (
+            (False, "testserver", "http://testserver/"),
+            (True, "shop.example.com", "https://shop.example.com/"),
+            (False, "shop.example.com", "http://shop.example.com/"),
+        ):
+            for _ in range(2):  # The second response comes from the cache.
+                response = client.get("/api/products/?page_size=1", secure=secure, HTTP_HOST=host)
+                self.assertTrue(response.json()["next"].startswith(prefix))
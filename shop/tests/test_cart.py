@@ -0,0 +1,115 @@
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from shop.models import Cart, NotificationOutbox
+
+from .helpers import IN_MEMORY_LAYER, make_product, make_user, run_concurrently
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class CartRaceTests(TransactionTestCase):
+    def test_concurrent_adds_lose_no_increment(self):
+        user, product = make_user(), make_product()
+
+        def add(index):
+            for _ in range(10):
+                Cart.objects.add_item(user.id, product.id, 1)
+
+        self.assertEqual(run_concurrently(8, add), [])
+        self.assertEqual(Cart.objects.get(userId=user, productId=product).quantity, 80)
+
+    def test_concurrent_adds_through_the_api(self):
+        user, product = make_user(), make_product()
+
+        def add(index):
+            for _ in range(5):
+                response = APIClient().post(
+                    "/api/cart/", {"userId": user.id, "productId": product.id}, format="json"
+                )
+                assert response.status_code in (200, 201), response.data
+
+        self.assertEqual(run_concurrently(6, add), [])
+        self.assertEqual(Cart.objects.filter(userId=user).count(), 1)
+        self.assertEqual(Cart.objects.get(userId=user).quantity, 30)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class CartTests(TestCase):
+    def setUp(self):
+        # Foreign keys are checked at commit, which a TestCase never reaches.
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        self.client = APIClient()
+        self.user = make_user()
+        self.products = [make_product(name=f"Widget {i}") for i in range(3)]
+
+    def test_add_upserts_one_line(self):
+        body = {"userId": self.user.id, "productId": self.products[0].id, "quantity": 2}
+        self.assertEqual(self.client.post("/api/cart/", body, format="json").status_code, 201)
+        response = self.client.post("/api/cart/", body, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["quantity"], 4)
+        self.assertEqual(Cart.objects.filter(userId=self.user).count(), 1)
+
+    def test_add_rejects_unknown_products_and_bad_quantities(self):
+        response = self.client.post(
+            "/api/cart/", {"userId": self.user.id, "productId": 999999}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/api/cart/",
+            {"userId": self.user.id, "productId": self.products[0].id, "quantity": 0},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_adds_sets_and_removes(self):
+        first, second, third = self.products
+        Cart.objects.add_item(self.user.id, first.id, 1)
+        Cart.objects.add_item(self.user.id, third.id, 1)
+        response = self.client.post(
+            "/api/cart/batch/",
+            {
+                "userId": self.user.id,
+                "items": [
+                    {"productId": first.id, "quantity": 2},
+                    {"productId": second.id, "quantity": 5, "op": "set"},
+                    {"productId": third.id, "op": "remove"},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(Cart.objects.filter(userId=self.user).values_list("productId", "quantity")),
+            {first.id: 3, second.id: 5},
+        )
+        self.assertEqual(
+            NotificationOutbox.objects.get(user=self.user).message,
+            "Your cart was updated (3 items).",
+        )
+
+    def test_merge_strategies(self):
+        first, second, _ = self.products
+        Cart.objects.add_item(self.user.id, first.id, 3)
+        items = [{"productId": first.id, "quantity": 2}, {"productId": second.id, "quantity": 1}]
+        self.client.post(
+            "/api/cart/merge/",
+            {"userId": self.user.id, "items": items, "strategy": "max"},
+            format="json",
+        )
+        self.assertEqual(Cart.objects.get(userId=self.user, productId=first).quantity, 3)
+        self.client.post(
+            "/api/cart/merge/", {"userId": self.user.id, "items": items}, format="json"
+        )
+        self.assertEqual(Cart.objects.get(userId=self.user, productId=first).quantity, 5)
+        self.assertEqual(Cart.objects.get(userId=self.user, productId=second).quantity, 2)
+
+    def test_empty_merge_sends_no_notification(self):
+        response = self.client.post(
+            "/api/cart/merge/", {"userId": self.user.id, "items": []}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
+        self.assertFalse(NotificationOutbox.objects.exists())
@@ -0,0 +1,74 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from shop.models import Cart, Order, SalesRollupDelta
+
+from .helpers import IN_MEMORY_LAYER, SHIPPING, make_product, make_user, run_concurrently
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class CheckoutRaceTests(TransactionTestCase):
+    def test_concurrent_checkouts_of_the_last_unit(self):
+        users = [make_user(f"buyer{i}") for i in range(6)]
+        product = make_product(stock=1)
+        codes = [None] * len(users)
+
+        def checkout(index):
+            codes[index] = (
+                APIClient()
+                .post(
+                    "/api/order/checkout/",
+                    {
+                        "user": users[index].id,
+                        "items": [{"product": product.id, "quantity": 1}],
+                        **SHIPPING,
+                    },
+                    format="json",
+                )
+                .status_code
+            )
+
+        self.assertEqual(run_concurrently(len(users), checkout), [])
+        self.assertEqual(sorted(codes), [201] + [400] * (len(users) - 1))
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = make_user()
+        self.plenty = make_product(name="Plenty", stock=10)
+        self.scarce = make_product(name="Scarce", stock=1)
+
+    def checkout(self, **body):
+        return self.client.post(
+            "/api/order/checkout/", {"user": self.user.id, **SHIPPING, **body}, format="json"
+        )
+
+    def test_checkout_orders_the_cart_and_empties_it(self):
+        Cart.objects.add_item(self.user.id, self.plenty.id, 2)
+        Cart.objects.add_item(self.user.id, self.scarce.id, 1)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 2)
+        self.assertFalse(Cart.objects.filter(userId=self.user).exists())
+        self.plenty.refresh_from_db()
+        self.scarce.refresh_from_db()
+        self.assertEqual((self.plenty.stock, self.scarce.stock), (8, 0))
+
+    def test_checkout_is_all_or_nothing(self):
+        Cart.objects.add_item(self.user.id, self.plenty.id, 2)
+        Cart.objects.add_item(self.user.id, self.scarce.id, 2)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["shortages"], [{"product": self.scarce.id, "available": 1}])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(SalesRollupDelta.objects.exists())
+        self.assertEqual(Cart.objects.filter(userId=self.user).count(), 2)
+        self.plenty.refresh_from_db()
+        self.assertEqual(self.plenty.stock, 10)
+
+    def test_empty_cart(self):
+        self.assertEqual(self.checkout().status_code, 400)
@@ -0,0 +1,37 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from shop.models import Category
+
+from .helpers import make_product
+
+
+@override_settings(PRODUCT_PRICE_BUCKETS=[1000, 2000])
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        shoes = Category.objects.create(name="Shoes")
+        bags = Category.objects.create(name="Bags")
+        make_product(price="900", category=shoes)
+        make_product(price="1500", category=shoes)
+        make_product(price="2500", category=shoes)
+        make_product(price="1200", category=bags)
+        make_product(price="800", category=bags, stock=0)
+
+    def test_each_facet_ignores_its_own_filter(self):
+        response = APIClient().get(
+            "/api/products/facets/?category__name=Shoes&max_price=2000&in_stock=true"
+        )
+        self.assertEqual(
+            response.json(),
+            {
+                "total": 2,
+                # Narrowed by price and stock, not by category.
+                "categories": [{"name": "Bags", "count": 1}, {"name": "Shoes", "count": 2}],
+                # Narrowed by category and stock, not by price.
+                "price_buckets": [
+                    {"min": 0, "max": 1000, "count": 1},
+                    {"min": 1000, "max": 2000, "count": 1},
+                    {"min": 2000, "max": None, "count": 1},
+                ],
+            },
+        )
@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from shop.models import IdempotencyRecord, Order
+
+from .helpers import IN_MEMORY_LAYER, SHIPPING, make_product, make_user
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client
+
+
+class FakeRazorpayOrders:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, data):
+        self.calls.append(connection.in_atomic_block)
+        return {"id": f"order_{len(self.calls)}"}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class OrderIdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+        self.product = make_product(stock=10)
+        self.body = {"user": self.user.id, "product": self.product.id, "quantity": 2, **SHIPPING}
+
+    def post(self, key, body=None, client=None):
+        return (client or self.client).post(
+            "/api/order/", body or self.body, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post("retry")
+        second = self.post("retry")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_same_key_with_another_body_is_422(self):
+        self.post("reused")
+        response = self.post("reused", {**self.body, "quantity": 3})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_request_in_progress_is_409(self):
+        self.post("busy")
+        # As if the first request were still running.
+        IdempotencyRecord.objects.filter(key="busy").update(status_code=None, response=None)
+        self.assertEqual(self.post("busy").status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_client_errors_are_replayed_too(self):
+        first = self.post("short", {**self.body, "quantity": 999})
+        second = self.post("short", {**self.body, "quantity": 999})
+        self.assertEqual((first.status_code, second.status_code), (400, 400))
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+
+    def test_keys_are_scoped_per_user(self):
+        other = make_user("other")
+        self.post("shared")
+        response = self.post("shared", {**self.body, "user": other.id}, client=client_for(other))
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_anonymous_requests_may_not_send_a_key(self):
+        response = self.post("anonymous", client=APIClient())
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(APIClient().post("/api/order/", self.body, format="json").status_code, 201)
+
+
+class RazorpayIdempotencyTests(TransactionTestCase):
+    def setUp(self):
+        self.orders = FakeRazorpayOrders()
+        patcher = mock.patch("shop.views.client.order", self.orders)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, client, key):
+        return client.post(
+            "/api/create-order/", {"amount": 5}, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_razorpay_is_called_once_and_outside_a_transaction(self):
+        client = client_for(make_user())
+        first, second = self.post(client, "pay"), self.post(client, "pay")
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(self.orders.calls, [False])
+        self.assertEqual(IdempotencyRecord.objects.get().scope.split(":")[0], "razorpay-order")
+
+    def test_another_user_with_the_same_key_gets_their_own_order(self):
+        first = self.post(client_for(make_user("first")), "pay")
+        second = self.post(client_for(make_user("second")), "pay")
+        self.assertNotEqual(first.data["order_id"], second.data["order_id"])
+        self.assertEqual(len(self.orders.calls), 2)
+
+    def test_anonymous_requests_may_not_send_a_key(self):
+        self.assertEqual(self.post(APIClient(), "pay").status_code, 400)
+        self.assertEqual(self.orders.calls, [])
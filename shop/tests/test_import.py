@@ -0,0 +1,71 @@
+import codecs
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from shop.cache import get_version
+from shop.importers import import_products
+from shop.models import Product
+
+from .helpers import make_user
+
+HEADER = b"sku,name,description,price,stock,image\n"
+
+
+def csv_line(sku):
+    return f"{sku},Item {sku},d,1,1,https://example.com/{sku}.png\n".encode()
+
+
+class ImportTests(TestCase):
+    def test_rows_the_database_would_refuse_are_reported(self):
+        long_image = "https://example.com/" + "x" * 200
+        data = (
+            "sku,name,description,price,stock,image\n"
+            "A1,Ok,d,1,1,https://example.com/1.png\n"
+            "A2,Big,d,1,3000000000,https://example.com/2.png\n"
+            f"A3,Long,d,1,1,{long_image}\n"
+            "A4,Nul,\"d\x00\",1,1,https://example.com/4.png\n"
+        )
+        version = get_version("catalog")
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_products(io.StringIO(data))
+        self.assertEqual(report["created"], 1)
+        self.assertEqual([error["line"] for error in report["errors"]], [3, 4, 5])
+        self.assertEqual(list(Product.objects.values_list("sku", flat=True)), ["A1"])
+        self.assertNotEqual(get_version("catalog"), version)
+
+    def test_undecodable_line_ends_the_import_there(self):
+        data = HEADER + csv_line("A1") + csv_line("A2") + csv_line("A3") + b"A4,\xff\n"
+        data += csv_line("A5")
+        report = import_products(codecs.iterdecode(io.BytesIO(data), "utf-8"), batch_size=2)
+        self.assertEqual((report["created"], report["error_count"]), (3, 1))
+        self.assertEqual(report["errors"][0]["line"], 5)
+        self.assertEqual(
+            sorted(Product.objects.values_list("sku", flat=True)), ["A1", "A2", "A3"]
+        )
+
+    def test_unparsable_csv_ends_the_import_there(self):
+        data = HEADER + csv_line("A1") + b"A2," + b"x" * 200_000 + b"\n" + csv_line("A3")
+        report = import_products(codecs.iterdecode(io.BytesIO(data), "utf-8"))
+        self.assertEqual((report["created"], report["error_count"]), (1, 1))
+        self.assertEqual(report["errors"][0]["line"], 3)
+        self.assertIn("Invalid CSV", report["errors"][0]["error"])
+
+    def test_undecodable_jsonl_line(self):
+        data = b'{"sku": "J1", "name": "J", "description": "d", "price": 1,'
+        data += b' "image": "https://example.com/j.png"}\n\n\xff\n'
+        report = import_products(codecs.iterdecode(io.BytesIO(data), "utf-8"), "jsonl")
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(report["errors"][0]["line"], 3)
+
+    def test_upload_reports_the_partial_import(self):
+        client = APIClient()
+        client.force_authenticate(make_user("admin", is_staff=True))
+        upload = SimpleUploadedFile("products.csv", HEADER + csv_line("A1") + b"A2,\xe9t\xe9\n")
+        response = client.post("/api/products/import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        report = response.json()["data"]
+        self.assertEqual((report["created"], report["updated"]), (1, 0))
+        self.assertEqual(report["errors"][0]["line"], 3)
@@ -0,0 +1,115 @@
+import io
+import time
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from shop.cache import get_version, mark_stale
+from shop.inventory import InsufficientStock, decrement_stock
+from shop.models import Order
+
+from .helpers import IN_MEMORY_LAYER, SHIPPING, make_product, make_user, run_concurrently
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class StockRaceTests(TransactionTestCase):
+    def test_concurrent_buyers_never_oversell(self):
+        user, product = make_user(), make_product(stock=25)
+        sold = [0] * 8
+
+        def buy(index):
+            for _ in range(5):
+                response = APIClient().post(
+                    "/api/order/",
+                    {"user": user.id, "product": product.id, "quantity": 1, **SHIPPING},
+                    format="json",
+                )
+                if response.status_code == 201:
+                    sold[index] += 1
+
+        self.assertEqual(run_concurrently(8, buy), [])
+        product.refresh_from_db()
+        self.assertEqual(sum(sold), 25)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.filter(product=product).count(), 25)
+
+    def test_concurrency_check_command(self):
+        # The load test itself, including the sales rollup path.
+        scenarios = (
+            ["cart"],
+            ["stock", "--stock", "60"],
+            ["stock", "--stock", "60", "--shards", "4"],
+        )
+        for args in scenarios:
+            call_command(
+                "concurrency_check",
+                *args,
+                "--threads",
+                "4",
+                "--iterations",
+                "20",
+                stdout=io.StringIO(),
+            )
+
+
+class DecrementStockTests(TestCase):
+    def test_decrement_refuses_to_oversell(self):
+        product = make_product(stock=2)
+        decrement_stock(product, 2)
+        with self.assertRaises(InsufficientStock) as raised:
+            decrement_stock(product, 1)
+        self.assertEqual(raised.exception.shortages, {product.id: 0})
+
+
+@override_settings(DEBUG=True, CHANNEL_LAYERS=IN_MEMORY_LAYER, STALE_VERSION_MAX_AGE=30)
+class CatalogStockFreshnessTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.client = APIClient()
+        self.user = make_user()
+        self.product = make_product()
+
+    def buy(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/order/",
+                {
+                    "user": self.user.id,
+                    "product": self.product.id,
+                    "quantity": quantity,
+                    **SHIPPING,
+                },
+                format="json",
+            )
+
+    def test_product_etags_are_weak(self):
+        self.assertTrue(self.client.get("/api/products/")["ETag"].startswith('W/"'))
+
+    def test_a_sale_does_not_flush_the_catalog_at_once(self):
+        version = get_version("catalog")
+        etag = self.client.get("/api/products/")["ETag"]
+        self.buy(2)
+        self.assertEqual(get_version("catalog"), version)
+        self.assertEqual(
+            self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+    def test_stale_stock_is_refreshed_without_the_scheduler(self):
+        etag = self.client.get("/api/products/")["ETag"]
+        self.buy(2)
+        with override_settings(STALE_VERSION_MAX_AGE=0):
+            response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["stock"], 8)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_later_marks_do_not_postpone_the_bump(self):
+        cache = caches["default"]
+        version = get_version("catalog")
+        cache.set("stale:catalog", time.time() - 60, None)
+        mark_stale("catalog")
+        self.assertEqual(get_version("catalog"), version + 1)
+        self.assertIsNone(cache.get("stale:catalog"))
+        self.assertEqual(get_version("catalog"), version + 1)
@@ -0,0 +1,100 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from shop.models import Notification
+from shop.tasks import delete_in_chunks
+
+from .helpers import IN_MEMORY_LAYER, make_user
+
+
+@override_settings(DEBUG=True, CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class NotificationListTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.client = APIClient()
+        self.user = make_user()
+        for index in range(5):
+            Notification.objects.create(user=self.user, message=str(index))
+        Notification.objects.create(user=make_user("other"), message="other")
+
+    def test_plain_list_unless_paging_is_asked_for(self):
+        response = self.client.get(f"/api/notifications/?user_id={self.user.id}")
+        self.assertEqual([n["message"] for n in response.json()], ["4", "3", "2", "1", "0"])
+
+    def test_cursor_pages_newest_first(self):
+        response = self.client.get(f"/api/notifications/?user_id={self.user.id}&page_size=2")
+        messages = [n["message"] for n in response.json()["results"]]
+        next_url = response.json()["next"]
+        while next_url:
+            page = self.client.get(next_url).json()
+            messages += [n["message"] for n in page["results"]]
+            next_url = page["next"]
+        self.assertEqual(messages, ["4", "3", "2", "1", "0"])
+
+    def test_unread_count(self):
+        url = f"/api/notifications/unread-count/?user_id={self.user.id}"
+        self.assertEqual(self.client.get("/api/notifications/unread-count/").status_code, 400)
+        Notification.objects.filter(message="0").update(is_read=True)
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {"user_id": self.user.id, "unread": 4})
+
+    def test_unread_count_follows_new_notifications(self):
+        url = f"/api/notifications/unread-count/?user_id={self.user.id}"
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, message="Hello")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["unread"], 6)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class NotificationBulkTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = make_user()
+        self.ids = [
+            Notification.objects.create(user=self.user, message=str(index)).id
+            for index in range(5)
+        ]
+        self.other = Notification.objects.create(user=make_user("other"), message="other")
+
+    def mark_read(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f"/api/notifications/mark-read/?user_id={self.user.id}", data, format="json"
+            )
+
+    def unread_ids(self):
+        return sorted(Notification.objects.filter(is_read=False).values_list("id", flat=True))
+
+    def test_mark_read_by_ids(self):
+        response = self.mark_read({"ids": [self.ids[1], self.ids[3], self.other.id]})
+        self.assertEqual(response.json(), {"marked": 2})
+        self.assertEqual(self.unread_ids(), [self.ids[0], self.ids[2], self.ids[4], self.other.id])
+
+    def test_mark_read_up_to(self):
+        self.assertEqual(self.mark_read({"up_to": self.ids[2]}).json(), {"marked": 3})
+        self.assertEqual(self.unread_ids(), [self.ids[3], self.ids[4], self.other.id])
+        # Already read rows are not counted again.
+        self.assertEqual(self.mark_read({"all": True}).json(), {"marked": 2})
+        self.assertEqual(self.unread_ids(), [self.other.id])
+
+    def test_mark_read_needs_exactly_one_mode(self):
+        self.assertEqual(self.mark_read({}).status_code, 400)
+        self.assertEqual(self.mark_read({"all": True, "up_to": 1}).status_code, 400)
+        self.assertEqual(len(self.unread_ids()), 6)
+
+    def test_clear_all_deletes_in_chunks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/notifications/clear-all/?user_id={self.user.id}")
+        self.assertEqual(response.json(), {"message": "Deleted 5 notifications."})
+        self.assertEqual(list(Notification.objects.all()), [self.other])
+
+    def test_chunked_delete_counts_every_chunk(self):
+        deleted = delete_in_chunks(Notification.objects.filter(user=self.user), chunk_size=2)
+        self.assertEqual(deleted, 5)
+        self.assertEqual(list(Notification.objects.all()), [self.other])
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shop.models import Order
+
+from .helpers import SHIPPING, make_product, make_user
+
+
+class OrderFilterTests(TestCase):
+    def test_date_range_covers_whole_days(self):
+        user, product = make_user(), make_product()
+        placed = {}
+        for label, moment in (
+            ("before", datetime(2026, 3, 9, 23, 59, 59)),
+            ("first", datetime(2026, 3, 10, 0, 0)),
+            ("last", datetime(2026, 3, 12, 23, 59, 59)),
+            ("after", datetime(2026, 3, 13, 0, 0)),
+        ):
+            order = Order.objects.create(user=user, product=product, quantity=1, **SHIPPING)
+            Order.objects.filter(id=order.id).update(date=timezone.make_aware(moment))
+            placed[order.id] = label
+
+        response = APIClient().get("/api/order/?date_from=2026-03-10&date_to=2026-03-12")
+        self.assertEqual(
+            sorted(placed[order["id"]] for order in response.json()), ["first", "last"]
+        )
+        response = APIClient().get("/api/order/?date_from=2026-03-13")
+        self.assertEqual([placed[order["id"]] for order in response.json()], ["after"])
+        self.assertEqual(APIClient().get("/api/order/?date_to=not-a-date").status_code, 400)
@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from shop.cache import get_cache
+from shop.models import Notification, NotificationOutbox
+from shop.notifications import (dispatcher_alive, dispatcher_stopped, drain_outbox,
+                                save_and_notify, save_and_notify_coalesced)
+
+from .helpers import IN_MEMORY_LAYER, make_user
+
+
+@override_settings(CHANNEL_LAYER="redis", CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class DispatcherFallbackTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = make_user()
+
+    def test_without_a_dispatcher_the_web_process_drains(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            save_and_notify(self.user, "Order placed.")
+        self.assertEqual(
+            list(Notification.objects.values_list("message", flat=True)), ["Order placed."]
+        )
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_a_running_dispatcher_is_left_to_drain(self):
+        dispatcher_alive()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            save_and_notify(self.user, "Order placed.")
+        self.assertEqual(callbacks, [])
+        self.assertTrue(NotificationOutbox.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+        dispatcher_stopped()
+        with self.captureOnCommitCallbacks(execute=True):
+            save_and_notify(self.user, "Order shipped.")
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def test_coalesced_notifications_keep_only_the_latest_message(self):
+        for quantity in (1, 2, 3):
+            save_and_notify_coalesced(
+                self.user, f"Quantity: {quantity}.", key="cart:1:1", window=60
+            )
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual(entry.message, "Quantity: 3.")
+        self.assertEqual(drain_outbox(), 0)
+
+        NotificationOutbox.objects.update(available_at=timezone.now())
+        self.assertEqual(drain_outbox(), 1)
+        self.assertEqual(
+            list(Notification.objects.values_list("message", flat=True)), ["Quantity: 3."]
+        )
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    @override_settings(CHANNEL_LAYER="memory", CHANNEL_LAYERS=IN_MEMORY_LAYER)
+    def test_memory_mode_schedules_one_drain_per_window(self):
+        with mock.patch("shop.notifications._drain_later") as drain_later:
+            with self.captureOnCommitCallbacks(execute=True):
+                for quantity in (1, 2, 3):
+                    save_and_notify_coalesced(
+                        self.user, f"Quantity: {quantity}.", key="cart:1:1", window=5
+                    )
+        drain_later.assert_called_once_with(5)
@@ -0,0 +1,27 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .helpers import make_product
+
+
+class ProductCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.ids = [make_product(name=f"P{index}").id for index in range(5)]
+
+    def test_plain_list_without_page_size(self):
+        response = self.client.get("/api/products/")
+        self.assertEqual([product["id"] for product in response.json()], self.ids)
+
+    def test_pages_cover_every_product_once(self):
+        body = self.client.get("/api/products/?page_size=2").json()
+        self.assertIsNone(body["previous"])
+        ids, pages = [], 0
+        while True:
+            ids += [product["id"] for product in body["results"]]
+            pages += 1
+            if not body["next"]:
+                break
+            body = self.client.get(body["next"]).json()
+        self.assertEqual((ids, pages), (self.ids, 3))
+        self.assertIn("cursor=", body["previous"])
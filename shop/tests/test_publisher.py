@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from channels.layers import InMemoryChannelLayer
+from django.test import SimpleTestCase
+
+from shop.publisher import Publisher
+
+
+class FakeChannelLayer:
+    """Records group_sends; each takes ``latency`` seconds, or waits for ``gate``."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = []
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    async def group_send(self, group, event):
+        self.started.set()
+        self.gate.wait()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.append((group, event))
+
+
+class PublisherTests(SimpleTestCase):
+    def publisher(self, layer, maxsize=100, batch_size=100):
+        patcher = mock.patch("shop.publisher.get_channel_layer", return_value=layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return Publisher(maxsize=maxsize, batch_size=batch_size)
+
+    def test_full_queue_drops_and_counts(self):
+        layer = FakeChannelLayer()
+        layer.gate.clear()
+        publisher = self.publisher(layer, maxsize=2)
+        self.assertTrue(publisher.publish("g", {"n": 0}))
+        # The sender holds event 0, so the next two fill the queue.
+        self.assertTrue(layer.started.wait(5))
+        self.assertTrue(publisher.publish("g", {"n": 1}))
+        self.assertTrue(publisher.publish("g", {"n": 2}))
+        self.assertFalse(publisher.publish("g", {"n": 3}))
+        self.assertFalse(publisher.publish("g", {"n": 4}, timeout=0.05))
+        self.assertFalse(publisher.flush(timeout=0.05))
+
+        layer.gate.set()
+        self.assertTrue(publisher.flush())
+        self.assertEqual([event["n"] for _, event in layer.sent], [0, 1, 2])
+        stats = publisher.stats()
+        self.assertEqual((stats["published"], stats["dropped"]), (3, 2))
+        self.assertEqual(stats["high_water"], 2)
+        self.assertEqual((stats["queued"], stats["capacity"]), (0, 2))
+
+    def test_queued_events_go_out_as_one_batch(self):
+        layer = FakeChannelLayer()
+        layer.gate.clear()
+        publisher = self.publisher(layer, batch_size=4)
+        publisher.publish("g", {"n": 0})
+        self.assertTrue(layer.started.wait(5))
+        for n in range(1, 7):
+            publisher.publish("g", {"n": n})
+
+        layer.gate.set()
+        self.assertTrue(publisher.flush())
+        stats = publisher.stats()
+        self.assertEqual(stats["published"], 7)
+        self.assertEqual((stats["batches"], stats["largest_batch"]), (3, 4))
+
+    def test_slow_sends_overlap(self):
+        # 500 sends of 20 ms each take 10 s one after another.
+        publisher = self.publisher(FakeChannelLayer(latency=0.02), maxsize=1000)
+        started = time.monotonic()
+        for n in range(500):
+            self.assertTrue(publisher.publish("g", {"n": n}))
+        self.assertTrue(publisher.flush(timeout=10))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(publisher.stats()["published"], 500)
+
+    def test_failed_sends_are_counted(self):
+        layer = FakeChannelLayer()
+        layer.group_send = mock.AsyncMock(side_effect=[None, ConnectionError("down")])
+        publisher = self.publisher(layer)
+        with self.assertLogs("shop.publisher", "ERROR"):
+            publisher.publish("g", {"n": 0})
+            publisher.publish("g", {"n": 1})
+            self.assertTrue(publisher.flush())
+        stats = publisher.stats()
+        self.assertEqual((stats["published"], stats["failed"]), (1, 1))
+
+    def test_in_memory_layer_sends_right_away(self):
+        layer = InMemoryChannelLayer()
+        publisher = self.publisher(layer)
+        self.assertTrue(publisher.publish("g", {"type": "test"}))
+
+        with (
+            mock.patch.object(layer, "group_send", side_effect=ConnectionError("down")),
+            self.assertLogs("shop.publisher", "ERROR"),
+        ):
+            self.assertFalse(publisher.publish("g", {"type": "test"}))
+        stats = publisher.stats()
+        self.assertEqual((stats["published"], stats["failed"]), (1, 1))
+        self.assertIsNone(publisher._thread)
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.db import connections
+from django.test import TestCase
+from django.utils import timezone
+
+from shop.models import Notification, PeriodicJobRun
+from shop.scheduler import Job, _lock_id, run_job
+from shop.tasks import delete_old_notifications
+
+from .helpers import make_user
+
+
+class RunJobTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.job = Job("test_job", timedelta(hours=1), lambda: self.calls.append(1) or "ok")
+
+    def test_runs_and_records_a_due_job(self):
+        run = run_job(self.job)
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(run.last_result, "ok")
+        self.assertIsNotNone(PeriodicJobRun.objects.get(name="test_job").last_finished_at)
+
+    def test_a_job_that_is_not_due_is_skipped(self):
+        run_job(self.job)
+        self.assertIsNone(run_job(self.job))
+        self.assertEqual(self.calls, [1])
+
+        PeriodicJobRun.objects.update(last_started_at=timezone.now() - timedelta(hours=2))
+        self.assertIsNotNone(run_job(self.job))
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_a_job_locked_by_another_node_is_skipped(self):
+        other = connections.create_connection("default")
+        try:
+            with other.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s)", [_lock_id("test_job")])
+                self.assertIsNone(run_job(self.job, force=True))
+                self.assertEqual(self.calls, [])
+                self.assertFalse(PeriodicJobRun.objects.exists())
+                # Released explicitly: the server may end the session after close() returns.
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [_lock_id("test_job")])
+        finally:
+            other.close()
+
+        self.assertIsNotNone(run_job(self.job))
+        self.assertEqual(self.calls, [1])
+
+
+class NotificationRetentionTests(TestCase):
+    def test_only_rows_past_the_cutoff_are_deleted_and_counted(self):
+        user = make_user()
+        notifications = [
+            Notification.objects.create(user=user, message=str(index)) for index in range(7)
+        ]
+        old = timezone.now() - timedelta(days=10)
+        # Rows 0-4 are old except 1, which sits inside a range that is walked.
+        Notification.objects.filter(
+            id__in=[notifications[index].id for index in (0, 2, 3, 4)]
+        ).update(created_at=old)
+
+        result = delete_old_notifications(days=7, batch_size=2, pause=0)
+
+        self.assertEqual(result["deleted"], 4)
+        self.assertEqual(result["batches"], 3)
+        self.assertEqual(
+            sorted(Notification.objects.values_list("message", flat=True)), ["1", "5", "6"]
+        )
+
+    def test_nothing_to_delete(self):
+        Notification.objects.create(user=make_user(), message="new")
+        result = delete_old_notifications(days=7, batch_size=2, pause=0)
+        self.assertEqual((result["deleted"], result["batches"]), (0, 0))
+        self.assertEqual(Notification.objects.count(), 1)
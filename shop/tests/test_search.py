@@ -0,0 +1,53 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from shop.models import Category, Product
+
+from .helpers import make_product
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        shoes = Category.objects.create(name="Shoes")
+        bags = Category.objects.create(name="Bags")
+        make_product(name="Red running shoes", description="Light", price="1500", category=shoes)
+        make_product(name="Canvas sneaker", description="Goes with red socks", price="900",
+                     category=shoes)
+        make_product(name="Red tote", description="A bag", price="2500", category=bags)
+        make_product(name="Blue tote", description="A bag", price="2500", category=bags)
+
+    def search(self, query):
+        response = self.client.get(f"/api/products/search/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [product["name"] for product in response.json()["results"]]
+
+    def test_name_matches_rank_above_description_matches(self):
+        names = self.search("q=red")
+        self.assertEqual(len(names), 3)
+        self.assertEqual(names[-1], "Canvas sneaker")
+        self.assertEqual(self.search("q=red shoes"), ["Red running shoes"])
+
+    def test_category_and_price_filters(self):
+        self.assertEqual(self.search("q=red&category=Bags"), ["Red tote"])
+        self.assertEqual(self.search("q=red&max_price=1000"), ["Canvas sneaker"])
+        self.assertEqual(
+            self.search("q=red&min_price=1000&max_price=2000"), ["Red running shoes"]
+        )
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get("/api/products/search/").status_code, 400)
+        response = self.client.get("/api/products/search/?q=red&min_price=cheap")
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_search_reads_the_search_vector(self):
+        product = Product.objects.first()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/products/")
+            self.client.get(f"/api/products/{product.id}/")
+            list(Product.objects.all())
+        self.assertTrue(queries.captured_queries)
+        for query in queries.captured_queries:
+            self.assertNotIn("search_vector", query["sql"])
@@ -0,0 +1,31 @@
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from shop.models import Category, Notification, Order, Product
+from shop.serializers import NotificationSerializer, OrderSerializer, ProductSerializer
+
+from .helpers import SHIPPING, make_product, make_user
+
+
+class ValuesSerializerTests(TestCase):
+    def assert_same_json(self, serializer_class, queryset):
+        serializer = serializer_class()
+        self.assertTrue(serializer.supports_values())
+        fast = serializer.represent_values(serializer.values_queryset(queryset))
+        slow = serializer_class(queryset, many=True).data
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(slow))
+
+    def test_values_render_like_the_serializer(self):
+        category = Category.objects.create(name="Tools")
+        user = make_user()
+        products = [
+            make_product(name="Hammer", price="1234.50", category=category),
+            make_product(name="Nail", price="0.05", stock=None),
+        ]
+        for product in products:
+            Order.objects.create(user=user, product=product, quantity=3, **SHIPPING)
+        Notification.objects.create(user=user, message="Hello")
+
+        self.assert_same_json(ProductSerializer, Product.objects.order_by("id"))
+        self.assert_same_json(OrderSerializer, Order.objects.order_by("id"))
+        self.assert_same_json(NotificationSerializer, Notification.objects.order_by("id"))
@@ -0,0 +1,44 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from shop.models import Category
+
+from .helpers import make_product
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.product = make_product(category=Category.objects.create(name="Tools"))
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), " ".join(query["sql"] for query in queries.captured_queries)
+
+    def test_fields_keeps_only_the_named_fields(self):
+        body, sql = self.get(f"/api/products/{self.product.id}/?fields=id,name,category")
+        self.assertEqual(body, {"id": self.product.id, "name": "Widget", "category": "Tools"})
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"price"', sql)
+
+        body, sql = self.get("/api/products/?fields=id,price")
+        self.assertEqual(body, [{"id": self.product.id, "price": "10.50"}])
+        self.assertNotIn('"description"', sql)
+
+    def test_omit_drops_the_named_fields(self):
+        body, sql = self.get(f"/api/products/{self.product.id}/?omit=description,image")
+        self.assertNotIn("description", body)
+        self.assertNotIn("image", body)
+        self.assertEqual(body["name"], "Widget")
+        self.assertNotIn('"description"', sql)
+
+    def test_unknown_names_are_rejected(self):
+        for query in ("fields=nmae", "fields=id,nmae", "omit=nmae"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/products/?{query}")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("nmae", str(response.json()))
@@ -0,0 +1,122 @@
+import json
+from datetime import timedelta
+
+import jwt
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from shop import routing
+from shop.cache import get_cache
+from shop.middleware import JWTAuthMiddleware
+from shop.models import Notification
+from shop.notifications import (ADMINS_GROUP, _connections_key, connection_alive,
+                                connection_closed, connection_opened, notifications_changed,
+                                online_user_ids)
+from shop.serializers import CustomTokenObtainPairSerializer
+
+from .helpers import IN_MEMORY_LAYER, make_user
+
+application = JWTAuthMiddleware(URLRouter(routing.websocket_urlpatterns))
+
+
+def access_token(user, lifetime=None):
+    token = CustomTokenObtainPairSerializer.get_token(user).access_token
+    if lifetime is not None:
+        token.set_exp(lifetime=lifetime)
+    return str(token)
+
+
+# The consumer closes the thread's database connection on connect and
+# disconnect, which a TestCase transaction would not survive.
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class NotificationSocketTests(TransactionTestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = make_user()
+        self.staff = make_user("admin", is_staff=True)
+
+    async def connect(self, path, headers=None):
+        communicator = WebsocketCommunicator(application, path, headers=headers)
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_valid_token_in_the_query_or_header(self):
+        token = access_token(self.user)
+        communicator, connected = await self.connect(f"/ws/notifications/?token={token}")
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+        communicator, connected = await self.connect(
+            "/ws/notifications/", headers=[(b"authorization", f"Bearer {token}".encode())]
+        )
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+    async def test_missing_expired_and_forged_tokens_are_refused(self):
+        expired = access_token(self.user, lifetime=-timedelta(seconds=1))
+        payload = jwt.decode(access_token(self.user), options={"verify_signature": False})
+        forged = jwt.encode(payload, "not-the-signing-key", algorithm="HS256")
+        for query in ("", "?token=", f"?token={expired}", f"?token={forged}"):
+            with self.subTest(query=query):
+                communicator, connected = await self.connect(f"/ws/notifications/{query}")
+                self.assertFalse(connected)
+
+    async def test_legacy_path_needs_the_token_username(self):
+        token = access_token(self.user)
+        communicator, connected = await self.connect(f"/ws/notifications/admin/?token={token}")
+        self.assertFalse(connected)
+
+        communicator, connected = await self.connect(f"/ws/notifications/buyer/?token={token}")
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+    async def test_only_staff_sockets_join_the_admins_group(self):
+        user_socket, _ = await self.connect(f"/ws/notifications/?token={access_token(self.user)}")
+        staff_socket, _ = await self.connect(
+            f"/ws/notifications/?token={access_token(self.staff)}"
+        )
+        await get_channel_layer().group_send(
+            ADMINS_GROUP, {"type": "send_notification", "content": {"message": "New order."}}
+        )
+
+        self.assertEqual(json.loads(await staff_socket.receive_from()), {"message": "New order."})
+        self.assertTrue(await user_socket.receive_nothing())
+        await user_socket.disconnect()
+        await staff_socket.disconnect()
+
+    async def test_unread_count_is_pushed_when_notifications_change(self):
+        await Notification.objects.acreate(user=self.user, message="Hello")
+        socket, _ = await self.connect(f"/ws/notifications/?token={access_token(self.user)}")
+        await sync_to_async(notifications_changed)(self.user.id)
+        self.assertEqual(await socket.receive_json_from(), {"type": "unread_count", "unread": 1})
+        await socket.disconnect()
+
+
+@override_settings(NOTIFICATION_SKIP_OFFLINE=True)
+class PresenceTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+
+    def test_refresh_after_eviction_keeps_the_last_socket_counted(self):
+        for _ in range(3):
+            connection_opened(1)
+        get_cache().delete(_connections_key(1))
+        # Each socket refreshes; the counter comes back as 1, not 3.
+        for _ in range(3):
+            connection_alive(1)
+        connection_closed(1)
+        connection_closed(1)
+
+        connection_alive(1)
+        self.assertEqual(online_user_ids([1]), {1})
+        connection_closed(1)
+        self.assertEqual(online_user_ids([1]), set())
+
+    def test_refresh_leaves_a_positive_count_alone(self):
+        connection_opened(1)
+        connection_opened(1)
+        connection_alive(1)
+        self.assertEqual(get_cache().get(_connections_key(1)), 2)
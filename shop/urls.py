@@ -1,9 +1,10 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CartViewSet, CategoryViewSet, CustomLoginView,
+from .views import (CacheStatsView, CartViewSet, CategoryViewSet, CustomLoginView,
                     ForgotPasswordView, OrderViewSet, ProductViewSet,
-                    ResetPasswordView, UserRegisterView, WishlistViewSet,
+                    PublisherStatsView, ResetPasswordView, SalesAnalyticsView,
+                    UserRegisterView, WishlistViewSet,
                     create_razorpay_order, verify_payment,NotificationViewSet)
 
 router = DefaultRouter()
@@ -21,5 +22,8 @@ urlpatterns = [
     path("login/", CustomLoginView.as_view(), name="custom_login"),
     path("create-order/", create_razorpay_order),
     path("verify-payment/", verify_payment),
+    path("cache-stats/", CacheStatsView.as_view(), name="cache-stats"),
+    path("publisher-stats/", PublisherStatsView.as_view(), name="publisher-stats"),
+    path("analytics/sales/", SalesAnalyticsView.as_view(), name="sales-analytics"),
     path("", include(router.urls)),
 ]
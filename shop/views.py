@@ -1,27 +1,54 @@
+import codecs
 import uuid
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
 import razorpay
 from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
 from django.core.mail import send_mail
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Window
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (api_view, authentication_classes,
+                                       permission_classes)
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.decorators import action
+from .analytics import GROUPINGS, record_order_changed, record_orders_created, sales_report
+from .cache import CachedResponseMixin, ETagMixin, cache_stats
+from .filters import OrderFilter, ProductFilter
+from .idempotency import idempotent
+from .importers import import_products
 from .models import Cart, Category, Order, Product, User, Wishlist,Notification
-from .notifications import (notify_user_cart_updated,
+from .inventory import InsufficientStock, decrement_stock, reserve_stock
+from .notifications import (notify_checkout_to_admins,
+                            notify_user_cart_batch_updated,
+                            notify_user_cart_updated,
+                            notify_user_checkout_completed,
                             notify_user_order_created,
                             notify_user_order_status_changed,
-                            notify_order_created_to_admins)
-from .serializers import (CartSerializer, CategorySerializer,
+                            notify_order_created_to_admins,
+                            get_unread_count, notifications_changed)
+from .pagination import (NotificationCursorPagination, OrderCursorPagination,
+                         ProductCursorPagination, SearchPagination)
+from .publisher import publisher
+from .serializers import (CartBatchSerializer, CartMergeSerializer,
+                          CartSerializer, CategorySerializer,
+                          CheckoutSerializer,
                           CustomTokenObtainPairSerializer, OrderSerializer,
                           ProductSerializer, UserSerializer,
-                          WishlistSerializer,NotificationSerializer)
+                          WishlistSerializer,NotificationSerializer,
+                          NotificationMarkReadSerializer,
+                          only_sparse_fields)
+from .tasks import delete_in_chunks
 
 reset_tokens = {}  # Temporary store (use DB for production)
 
@@ -73,6 +100,8 @@ client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_S
 
 
 @api_view(["POST"])
+@authentication_classes([JWTAuthentication])
+@idempotent("razorpay-order", atomic=False)
 def create_razorpay_order(request):
     amount = request.data.get("amount")
     if not amount:
@@ -151,16 +180,20 @@ class UserRegisterView(APIView):
         )
 
     def get(self, request, pk=None):
+        context = {"request": request}
+        queryset = only_sparse_fields(
+            User.objects.filter(is_superuser=False), UserSerializer(context=context)
+        )
         if pk:
-            user = get_object_or_404(User, pk=pk, is_superuser=False)
-            serializer = UserSerializer(user)
+            user = get_object_or_404(queryset, pk=pk)
+            serializer = UserSerializer(user, context=context)
             return Response(
                 {"status": "success", "data": serializer.data},
                 status=status.HTTP_200_OK
             )
 
-        queryset = User.objects.filter(is_superuser=False).order_by("id")
-        serializer = UserSerializer(queryset, many=True)
+        queryset = queryset.order_by("id")
+        serializer = UserSerializer(queryset, many=True, context=context)
 
         return Response(
             {"status": "success", "data": serializer.data},
@@ -182,22 +215,305 @@ class CustomLoginView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+class SparseFieldsViewSetMixin:
+    """Pushes ``?fields=`` / ``?omit=`` down into the queryset via ``.only()``."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != "GET":
+            return queryset
+        return only_sparse_fields(queryset, self.get_serializer())
+
+
+class ValuesListMixin:
+    """
+    Serves ``list`` through the serializer's ``.values()`` fast path (see
+    ``ValuesSerializerMixin``), falling back to the regular path for
+    serializers it cannot handle.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        if not serializer.supports_values():
+            return super().list(request, *args, **kwargs)
+
+        # Cursor pagination reads its position from the ordering column.
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        queryset = serializer.values_queryset(
+            self.filter_queryset(self.get_queryset()),
+            extra=[field.lstrip("-") for field in ordering],
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.represent_values(page))
+        return Response(serializer.represent_values(queryset))
+
+
+class ProductViewSet(
+    ETagMixin,
+    CachedResponseMixin,
+    SparseFieldsViewSetMixin,
+    ValuesListMixin,
+    viewsets.ModelViewSet,
+):
+    cache_scope = "catalog"
+    queryset = Product.objects.select_related("category").order_by("id")
     serializer_class = ProductSerializer
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = [
-        "category__name",
-    ]
+    filterset_class = ProductFilter
+    pagination_class = ProductCursorPagination
     permission_classes = [AllowAny]
 
+    # Stock in the body may lag behind the catalog version; see shop.inventory.
+    weak_etag = True
+
+    def get_etag_scope(self, request):
+        return "catalog"
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """
+        Product counts per category and per price bucket for the current
+        filters, e.g. ``/api/products/facets/?in_stock=true&max_price=5000``.
+
+        Each facet ignores its own filter (the category facet is not
+        narrowed by ``category__name``, the price facet not by the price
+        range), and everything is computed in a single grouped query.
+        """
+        return self.cached_response(request, lambda: self._facets(request))
+
+    def _facets(self, request):
+        filterset = ProductFilter(request.query_params, queryset=Product.objects.all())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = filterset.form.cleaned_data
+
+        queryset = filterset.queryset
+        for name in ("active", "in_stock"):
+            queryset = filterset.filters[name].filter(queryset, params.get(name))
+
+        category_q = Q()
+        if params.get("category__name"):
+            category_q &= Q(category__name=params["category__name"])
+        price_q = Q()
+        if params.get("min_price") is not None:
+            price_q &= Q(price__gte=params["min_price"])
+        if params.get("max_price") is not None:
+            price_q &= Q(price__lte=params["max_price"])
+
+        def count(q):
+            return Count("id", filter=q) if q else Count("id")
+
+        bounds = [0, *settings.PRODUCT_PRICE_BUCKETS, None]
+        buckets = list(zip(bounds, bounds[1:]))
+        aggregates = {"total": count(category_q & price_q), "in_category": count(price_q)}
+        for i, (low, high) in enumerate(buckets):
+            bucket_q = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+            aggregates[f"bucket_{i}"] = count(category_q & bucket_q)
+
+        rows = list(
+            queryset.values("category__name").annotate(**aggregates).order_by("category__name")
+        )
+
+        return Response(
+            {
+                "total": sum(row["total"] for row in rows),
+                "categories": [
+                    {"name": row["category__name"], "count": row["in_category"]}
+                    for row in rows
+                    if row["in_category"]
+                ],
+                "price_buckets": [
+                    {
+                        "min": low,
+                        "max": high,
+                        "count": sum(row[f"bucket_{i}"] for row in rows),
+                    }
+                    for i, (low, high) in enumerate(buckets)
+                ],
+            }
+        )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        authentication_classes=[JWTAuthentication],
+        permission_classes=[IsAdminUser],
+    )
+    def bulk_import(self, request):
+        """
+        Upsert products from an uploaded CSV or JSON Lines ``file`` keyed on
+        ``sku``; see ``shop.importers.import_products``.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Upload the products as 'file'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fmt = request.data.get("format") or (
+            "jsonl" if upload.name.endswith((".jsonl", ".ndjson")) else "csv"
+        )
+        if fmt not in ("csv", "jsonl"):
+            return Response(
+                {"error": "'format' must be 'csv' or 'jsonl'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Decoded line by line, so a bad byte is reported at its own line
+        # after everything before it was imported.
+        report = import_products(codecs.iterdecode(upload.file, "utf-8"), fmt)
+        return Response({"status": "success", "data": report})
+
+    @action(detail=False, methods=["get"], pagination_class=SearchPagination)
+    def search(self, request):
+        """
+        Ranked full-text search over product name and description, e.g.
+        ``/api/products/search/?q=red shoes&category=Shoes&max_price=2000``.
+        """
+        return self.cached_response(request, lambda: self._search(request))
+
+    def _search(self, request):
+        q = request.query_params.get("q", "").strip()
+        if not q:
+            return Response(
+                {"error": "Query parameter 'q' is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        query = SearchQuery(q, search_type="websearch", config="english")
+        queryset = self.get_queryset().filter(search_vector=query)
+
+        category = request.query_params.get("category")
+        if category:
+            queryset = queryset.filter(category__name=category)
+
+        for param, lookup in (("min_price", "price__gte"), ("max_price", "price__lte")):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: Decimal(value)})
+                except InvalidOperation:
+                    return Response(
+                        {"error": f"'{param}' must be a number."},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+        queryset = queryset.annotate(
+            rank=SearchRank(F("search_vector"), query)
+        ).order_by("-rank", "id")
 
-class CategoryViewSet(viewsets.ModelViewSet):
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_scope = "catalog"
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
 
-class CartViewSet(viewsets.ModelViewSet):
+class CacheStatsView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"status": "success", "data": cache_stats()})
+
+
+class PublisherStatsView(APIView):
+    # Websocket pushes of this worker process (see shop.publisher).
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"status": "success", "data": publisher.stats()})
+
+
+class SalesAnalyticsView(APIView):
+    """
+    Sales totals from the daily rollups: ``?date_from=&date_to=`` (ISO
+    dates, default the last 30 days), ``group_by`` one of day, product,
+    category or status, and optional ``status`` (comma separated),
+    ``product`` and ``category`` filters.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            date_to = (
+                date.fromisoformat(params["date_to"])
+                if params.get("date_to")
+                else timezone.localdate()
+            )
+            date_from = (
+                date.fromisoformat(params["date_from"])
+                if params.get("date_from")
+                else date_to - timedelta(days=29)
+            )
+        except ValueError:
+            return Response(
+                {"error": "Dates must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if date_from > date_to:
+            return Response(
+                {"error": "date_from must not be after date_to."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if (date_to - date_from).days > 366:
+            return Response(
+                {"error": "The date range is limited to one year."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        group_by = params.get("group_by", "day")
+        if group_by not in GROUPINGS:
+            return Response(
+                {"error": f"group_by must be one of {', '.join(GROUPINGS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        product_id = params.get("product")
+        if product_id and not product_id.isdigit():
+            return Response(
+                {"error": "product must be an id."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        statuses = [value for value in params.get("status", "").split(",") if value]
+
+        rows = sales_report(
+            date_from,
+            date_to,
+            group_by=group_by,
+            statuses=statuses,
+            product_id=product_id,
+            category=params.get("category"),
+        )
+        revenue = sum((row["revenue"] for row in rows), Decimal("0"))
+        for row in rows:
+            # Amounts are strings everywhere else in the API (see Product.price).
+            row["revenue"] = str(row["revenue"])
+        return Response(
+            {
+                "status": "success",
+                "date_from": date_from,
+                "date_to": date_to,
+                "group_by": group_by,
+                "totals": {
+                    "orders": sum(row["orders"] for row in rows),
+                    "units": sum(row["units"] for row in rows),
+                    "revenue": str(revenue),
+                },
+                "data": rows,
+            }
+        )
+
+
+class CartViewSet(ETagMixin, viewsets.ModelViewSet):
     queryset = Cart.objects.select_related(
         "userId", "productId", "productId__category"
     ).all()
@@ -206,33 +522,196 @@ class CartViewSet(viewsets.ModelViewSet):
     filterset_fields = ["userId", "productId"]
     permission_classes = [AllowAny]
 
+    def get_etag_scope(self, request):
+        user_id = request.query_params.get("userId")
+        if self.action == "list" and user_id:
+            return f"cart:{user_id}"
+        return None
+
     def create(self, request, *args, **kwargs):
         user_id = request.data.get("userId")
         product_id = request.data.get("productId")
-        quantity = int(request.data.get("quantity", 1))
+        try:
+            quantity = int(request.data.get("quantity", 1))
+        except (TypeError, ValueError):
+            quantity = 0
+        if not user_id or not product_id or quantity < 1:
+            return Response(
+                {"error": "userId, productId and a positive quantity are required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        # Check if the item is already in cart
-        cart_item = Cart.objects.filter(userId=user_id, productId=product_id).first()
+        try:
+            with transaction.atomic():
+                cart_item, created = Cart.objects.add_item(user_id, product_id, quantity)
+                notify_user_cart_updated(cart_item.userId, cart_item)
+        except (IntegrityError, DataError):
+            return Response(
+                {"error": "Unknown user or product."}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        if cart_item:
-            cart_item.quantity += quantity
-            cart_item.save()
+        serializer = self.get_serializer(cart_item)
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
 
-            notify_user_cart_updated(cart_item.userId, cart_item)
 
-            serializer = self.get_serializer(cart_item)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+    def _apply_cart_changes(self, user_id, upserts, removals):
+        """
+        Apply ``{mode: {product_id: quantity}}`` upserts and a list of
+        removals in one transaction, then send one notification (none if
+        nothing changed, e.g. merging an empty guest cart) and return the
+        resulting cart. The number of statements does not depend on the
+        number of lines.
+        """
+        user = get_object_or_404(User.objects.only("id", "username"), pk=user_id)
+        try:
+            with transaction.atomic():
+                for mode, quantities in upserts.items():
+                    Cart.objects.upsert_items(user.id, quantities, mode)
+                if removals:
+                    Cart.objects.filter(userId=user, productId__in=removals).delete()
+                changed = sum(len(quantities) for quantities in upserts.values()) + len(removals)
+                if changed:
+                    notify_user_cart_batch_updated(user, changed)
+        except IntegrityError:
+            return Response(
+                {"error": "Unknown product."}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Create new cart item
-        new_cart_item = Cart.objects.create(
-            userId_id=user_id, productId_id=product_id, quantity=quantity
+        cart = Cart.objects.filter(userId=user).order_by("id")
+        return Response(self.get_serializer(cart, many=True).data)
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Add, set or remove many lines of a user's cart at once::
+
+            {"userId": 1, "items": [{"productId": 3, "quantity": 2},
+                                    {"productId": 4, "quantity": 5, "op": "set"},
+                                    {"productId": 7, "op": "remove"}]}
+
+        Setting a quantity of 0 removes the line.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upserts = {"add": {}, "set": {}}
+        removals = []
+        for item in serializer.validated_data["items"]:
+            if item["op"] == "remove" or item["quantity"] == 0:
+                removals.append(item["productId"])
+            else:
+                upserts[item["op"]][item["productId"]] = item["quantity"]
+
+        return self._apply_cart_changes(
+            serializer.validated_data["userId"], upserts, removals
         )
 
-        # Notify user about cart addition
-        notify_user_cart_updated(new_cart_item.userId, new_cart_item)
+    @action(detail=False, methods=["post"])
+    def merge(self, request):
+        """
+        Merge a guest cart into a user's cart after login. With the ``sum``
+        strategy (default) quantities are added together, with ``max`` the
+        larger of the two is kept.
+        """
+        serializer = CartMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        quantities = {}
+        for item in serializer.validated_data["items"]:
+            product_id = item["productId"]
+            quantities[product_id] = quantities.get(product_id, 0) + item["quantity"]
+
+        mode = "add" if serializer.validated_data["strategy"] == "sum" else "max"
+        return self._apply_cart_changes(
+            serializer.validated_data["userId"], {mode: quantities}, []
+        )
 
-        serializer = self.get_serializer(new_cart_item)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """
+        The user's cart lines with product price and stock embedded, plus
+        totals, from one query: ``/api/cart/summary/?userId=``. Totals are
+        window sums, so they come back on every row of the same result.
+        """
+        user_id = request.query_params.get("userId")
+        if not user_id or not user_id.isdigit():
+            return Response(
+                {"error": "Query parameter 'userId' is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        line_total = F("quantity") * F("productId__price")
+        rows = list(
+            Cart.objects.filter(userId=user_id)
+            .annotate(
+                line_total=line_total,
+                subtotal=Window(Sum(line_total)),
+                item_count=Window(Sum("quantity")),
+            )
+            .values(
+                "id",
+                "quantity",
+                "line_total",
+                "subtotal",
+                "item_count",
+                "productId",
+                "productId__name",
+                "productId__price",
+                "productId__stock",
+                "productId__image",
+                "productId__active",
+                "productId__deleted",
+            )
+            .order_by("id")
+        )
+
+        items = []
+        stock_warnings = []
+        for row in rows:
+            available = row["productId__stock"] or 0
+            purchasable = row["productId__active"] and not row["productId__deleted"]
+            in_stock = purchasable and available >= row["quantity"]
+            items.append(
+                {
+                    "id": row["id"],
+                    "quantity": row["quantity"],
+                    "line_total": str(row["line_total"]),
+                    "in_stock": in_stock,
+                    "product": {
+                        "id": row["productId"],
+                        "name": row["productId__name"],
+                        "price": str(row["productId__price"]),
+                        "stock": row["productId__stock"],
+                        "image": row["productId__image"],
+                    },
+                }
+            )
+            if not in_stock:
+                stock_warnings.append(
+                    {
+                        "productId": row["productId"],
+                        "name": row["productId__name"],
+                        "requested": row["quantity"],
+                        "available": available if purchasable else 0,
+                    }
+                )
+
+        return Response(
+            {
+                "status": "success",
+                "data": {
+                    "userId": int(user_id),
+                    "items": items,
+                    "line_count": len(rows),
+                    "item_count": rows[0]["item_count"] if rows else 0,
+                    "subtotal": str(rows[0]["subtotal"]) if rows else "0.00",
+                    "stock_warnings": stock_warnings,
+                },
+            }
+        )
 
 
 class WishlistViewSet(viewsets.ModelViewSet):
@@ -252,61 +731,183 @@ class WishlistViewSet(viewsets.ModelViewSet):
         )
 
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all()
+class OrderViewSet(SparseFieldsViewSetMixin, ValuesListMixin, viewsets.ModelViewSet):
+    queryset = Order.objects.order_by("-date")
     serializer_class = OrderSerializer
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ["user", "product", "status"]
+    filterset_class = OrderFilter
+    pagination_class = OrderCursorPagination
     authentication_classes = [JWTAuthentication]
     permission_classes = [AllowAny]
 
+    @idempotent("order-create")
     def create(self, request, *args, **kwargs):
-        product_id = request.data.get("product")
-        quantity = int(request.data.get("quantity", 1))
-
-        product = get_object_or_404(Product, id=product_id)
-
-        if product.stock < quantity:
+        try:
+            with transaction.atomic():
+                response = super().create(request, *args, **kwargs)
+                order = self.created_order
+                notify_user_order_created(order.user, order)
+                notify_order_created_to_admins(order)
+        except InsufficientStock:
             return Response(
                 {"error": "Insufficient stock."}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Reduce stock
-        product.stock -= quantity
-        product.save()
+        return response
 
-        # Save order via DRF
-        response = super().create(request, *args, **kwargs)
+    def perform_create(self, serializer):
+        # Runs after validation, inside create()'s transaction: if saving the
+        # order fails the stock comes back.
+        decrement_stock(
+            serializer.validated_data["product"], serializer.validated_data["quantity"]
+        )
+        self.created_order = serializer.save()
+        record_orders_created([self.created_order])
+
+    @action(detail=False, methods=["post"])
+    @idempotent("order-checkout")
+    def checkout(self, request):
+        """
+        Turn the user's cart (or an explicit ``items`` list of
+        ``{"product", "quantity"}``) into one order per product in a single
+        transaction. Either every line is ordered or none is.
+        """
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        details = dict(serializer.validated_data)
+        user = details.pop("user")
+        items = details.pop("items", None)
 
-        # Send notification
-        if response.status_code == 201:
-            order_instance = Order.objects.get(id=response.data["id"])
-            notify_user_order_created(order_instance.user, order_instance)
-            notify_order_created_to_admins(order_instance)
+        try:
+            with transaction.atomic():
+                if items is None:
+                    quantities = dict(
+                        Cart.objects.select_for_update()
+                        .filter(userId=user)
+                        .values_list("productId", "quantity")
+                    )
+                else:
+                    quantities = {}
+                    for item in items:
+                        product_id = item["product"]
+                        quantities[product_id] = quantities.get(product_id, 0) + item["quantity"]
+                if not quantities:
+                    return Response(
+                        {"error": "Cart is empty."}, status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                reserve_stock(quantities)
+                orders = Order.objects.bulk_create(
+                    Order(user=user, product_id=product_id, quantity=quantity, **details)
+                    for product_id, quantity in sorted(quantities.items())
+                )
+                record_orders_created(orders)
+                if items is None:
+                    Cart.objects.filter(userId=user, productId__in=quantities).delete()
+                notify_user_checkout_completed(user, orders)
+                notify_checkout_to_admins(user, orders)
+        except InsufficientStock as exc:
+            return Response(
+                {
+                    "error": "Insufficient stock.",
+                    "shortages": [
+                        {"product": product_id, "available": available}
+                        for product_id, available in exc.shortages.items()
+                    ],
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        return response
+        return Response(
+            OrderSerializer(orders, many=True).data, status=status.HTTP_201_CREATED
+        )
 
     def perform_update(self, serializer):
-        old_order = Order.objects.get(id=serializer.instance.id)
-        new_order = serializer.save()
-
-        if old_order.status != new_order.status:
-            notify_user_order_status_changed(new_order.user, new_order)
-
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+        with transaction.atomic():
+            old_order = Order.objects.select_for_update().get(id=serializer.instance.id)
+            new_order = serializer.save()
+            if (old_order.status, old_order.product_id, old_order.quantity) != (
+                new_order.status,
+                new_order.product_id,
+                new_order.quantity,
+            ):
+                record_order_changed(old_order, new_order)
+            if old_order.status != new_order.status:
+                notify_user_order_status_changed(new_order.user, new_order)
+
+
+class NotificationViewSet(ETagMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
+    pagination_class = NotificationCursorPagination
     permission_classes = [AllowAny]
 
+    def get_etag_scope(self, request):
+        user_id = request.query_params.get("user_id")
+        if self.action in ("list", "unread_count") and user_id:
+            return f"notifications:{user_id}"
+        return None
+
     def get_queryset(self):
         user_id = self.request.query_params.get("user_id")
         if user_id:
             return Notification.objects.filter(user_id=user_id).order_by('-created_at')
         return Notification.objects.none()  # No ID, no notifications
 
+    @action(detail=False, methods=["get"], url_path="unread-count")
+    def unread_count(self, request):
+        """
+        ``{"unread": n}`` for the notification badge. Served from the cache,
+        or with ``If-None-Match`` as a 304, until the user's notifications
+        change.
+        """
+        user_id = request.query_params.get("user_id")
+        if not user_id or not user_id.isdigit():
+            return Response(
+                {"error": "user_id is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.conditional_response(
+            request,
+            lambda: Response({"user_id": int(user_id), "unread": get_unread_count(user_id)}),
+        )
+
+    @action(detail=False, methods=["post"], url_path="mark-read")
+    def mark_read(self, request):
+        """
+        Mark a user's notifications read with one ``UPDATE``: ``{"all":
+        true}``, ``{"ids": [...]}`` or ``{"up_to": id}`` (that notification
+        and every older one). The new unread count is pushed to the user's
+        sockets.
+        """
+        user_id = request.query_params.get("user_id")
+        if not user_id or not user_id.isdigit():
+            return Response(
+                {"error": "user_id is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        unread = Notification.objects.filter(user_id=user_id, is_read=False)
+        if data.get("ids"):
+            unread = unread.filter(id__in=data["ids"])
+        elif data.get("up_to"):
+            unread = unread.filter(id__lte=data["up_to"])
+        marked = unread.update(is_read=True)
+        if marked:
+            notifications_changed(user_id)
+        return Response({"marked": marked}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['delete'], url_path='clear-all')
     def clear_all(self, request):
         user_id = self.request.query_params.get("user_id")
-        deleted_count, _ = Notification.objects.filter(user_id=user_id).delete()
+        if not user_id or not user_id.isdigit():
+            return Response(
+                {"error": "user_id is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        # In chunks, so a user with a huge history does not lock it all at once.
+        deleted_count = delete_in_chunks(Notification.objects.filter(user_id=user_id))
+        if deleted_count:
+            notifications_changed(user_id)
         return Response(
             {"message": f"Deleted {deleted_count} notifications."},
             status=status.HTTP_200_OK